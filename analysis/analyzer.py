@@ -1,7 +1,12 @@
 # analysis/analyzer.py
 from django.utils import timezone
 from datetime import timedelta
+from collections import defaultdict
 from .models import Conversation, Message, ConversationAnalysis
+from .metrics import analysis_samples, record_new_analyses
+from .backends import get_backend
+from . import partitions
+import math
 import re
 
 def perform_analysis(conversation_id):
@@ -10,69 +15,25 @@ def perform_analysis(conversation_id):
     """
     try:
         conversation = Conversation.objects.get(id=conversation_id)
-        messages = conversation.messages.all().order_by('created_at')
-        
-        if not messages.exists():
-            return None
-        
-        # Separate messages
-        user_messages = [m for m in messages if m.sender == 'user']
-        ai_messages = [m for m in messages if m.sender == 'ai']
+        messages = list(
+            since_conversation_start(conversation.messages.all(), conversation.created_at).order_by('created_at')
+        )
         
-        if not user_messages or not ai_messages:
+        result = score_conversation(messages)
+        if result is None:
             return None
-        
-        # ============ ANALYSIS LOGIC ============
-        
-        # 1. CLARITY SCORE (5.0 max)
-        clarity = calculate_clarity(ai_messages)
-        
-        # 2. RELEVANCE SCORE (5.0 max)
-        relevance = calculate_relevance(user_messages, ai_messages)
-        
-        # 3. ACCURACY SCORE (5.0 max)
-        accuracy = calculate_accuracy(ai_messages)
-        
-        # 4. COMPLETENESS SCORE (5.0 max)
-        completeness = calculate_completeness(ai_messages)
-        
-        # 5. SENTIMENT ANALYSIS
-        sentiment = detect_sentiment(user_messages)
-        
-        # 6. EMPATHY SCORE (5.0 max, only if negative sentiment)
-        empathy = calculate_empathy(ai_messages, sentiment)
-        
-        # 7. RESPONSE TIME (in seconds)
-        avg_response_time = calculate_response_time(messages)
-        
-        # 8. RESOLUTION RATE (Boolean)
-        resolved = detect_resolution(user_messages, ai_messages)
-        
-        # 9. ESCALATION NEED (Boolean)
-        escalation = detect_escalation_need(user_messages, ai_messages, sentiment, resolved)
-        
-        # 10. FALLBACK FREQUENCY (Count)
-        fallback_count = count_fallbacks(ai_messages)
-        
-        # 11. OVERALL SCORE (Average of key metrics)
-        overall = calculate_overall_score(clarity, relevance, accuracy, completeness, empathy)
+        fields, gaps = result
+        refine_scores({conversation.id: (fields, messages)})
         
         # ============ SAVE TO DATABASE ============
         analysis, created = ConversationAnalysis.objects.update_or_create(
             conversation=conversation,
-            defaults={
-                'clarity_score': clarity,
-                'relevance_score': relevance,
-                'accuracy_score': accuracy,
-                'completeness_score': completeness,
-                'sentiment': sentiment,
-                'empathy_score': empathy,
-                'response_time_avg': avg_response_time,
-                'resolution_rate': resolved,
-                'escalation_need': escalation,
-                'fallback_frequency': fallback_count,
-                'overall_score': overall,
-            }
+            defaults=fields
+        )
+        
+        # Feed the fleet-wide distribution sketches
+        record_new_analyses(
+            {conversation.id: analysis_samples(analysis, gaps)}, {conversation.id: conversation.created_at}
         )
         
         return analysis
@@ -84,6 +45,192 @@ def perform_analysis(conversation_id):
         return None
 
 
+def since_conversation_start(messages, earliest):
+    """
+    Bounds a message query by the earliest conversation start when messages are
+    partitioned, so PostgreSQL only scans the months involved. This relies on
+    messages never predating their conversation (both get created_at on insert);
+    unpartitioned tables gain nothing from the bound, so they are left unbounded
+    and rows written with an earlier created_at are still analysed.
+    """
+    if partitions.supports_partitioning():
+        return messages.filter(created_at__gte=earliest)
+    return messages
+
+
+def analyze_conversations(conversation_ids):
+    """
+    Analyses a batch of conversations with one message fetch and one bulk result write.
+    Returns (analysed ids, skipped ids); skipped conversations are missing or have
+    nothing to analyse. Ids in neither list failed with an error.
+    """
+    created = dict(Conversation.objects.filter(id__in=conversation_ids).values_list('id', 'created_at'))
+    skipped = [conversation_id for conversation_id in conversation_ids if conversation_id not in created]
+    if not created:
+        return [], skipped
+    
+    messages_by_conversation = defaultdict(list)
+    messages = since_conversation_start(
+        Message.objects.filter(conversation_id__in=list(created)), min(created.values())
+    ).order_by('conversation_id', 'created_at')
+    for msg in messages:
+        messages_by_conversation[msg.conversation_id].append(msg)
+    
+    scored = {}
+    for conversation_id in created:
+        try:
+            result = score_conversation(messages_by_conversation[conversation_id])
+        except Exception as e:
+            print(f"Analysis error for conversation {conversation_id}: {e}")
+            continue
+        if result is None:
+            skipped.append(conversation_id)
+            continue
+        scored[conversation_id] = result
+    
+    # One backend call for the whole batch
+    refine_scores({
+        conversation_id: (fields, messages_by_conversation[conversation_id])
+        for conversation_id, (fields, gaps) in scored.items()
+    })
+    
+    analyses = []
+    samples = {}
+    for conversation_id, (fields, gaps) in scored.items():
+        analysis = ConversationAnalysis(conversation_id=conversation_id, **fields)
+        analyses.append(analysis)
+        samples[conversation_id] = analysis_samples(analysis, gaps)
+    
+    if not analyses:
+        return [], skipped
+    
+    # ============ SAVE TO DATABASE ============
+    ConversationAnalysis.objects.bulk_create(
+        analyses,
+        update_conflicts=True,
+        unique_fields=['conversation'],
+        update_fields=ANALYSIS_FIELDS,
+    )
+    record_new_analyses(samples, created)
+    
+    return list(samples), skipped
+
+
+# Result fields written by score_conversation (everything except keys and timestamps)
+ANALYSIS_FIELDS = [
+    'clarity_score', 'relevance_score', 'accuracy_score', 'completeness_score',
+    'sentiment', 'empathy_score', 'response_time_avg', 'response_time_max',
+    'response_time_p95', 'resolution_rate', 'escalation_need',
+    'fallback_frequency', 'overall_score',
+]
+
+
+def score_conversation(messages):
+    """
+    Scores a conversation's messages (ordered by created_at).
+    Returns (analysis fields, response time gaps), or None if there is nothing to analyse.
+    """
+    if not messages:
+        return None
+    
+    # Separate messages
+    user_messages = [m for m in messages if m.sender == 'user']
+    ai_messages = [m for m in messages if m.sender == 'ai']
+    
+    if not user_messages or not ai_messages:
+        return None
+    
+    # ============ ANALYSIS LOGIC ============
+    
+    # 1. CLARITY SCORE (5.0 max)
+    clarity = calculate_clarity(ai_messages)
+    
+    # 2. RELEVANCE SCORE (5.0 max)
+    relevance = calculate_relevance(user_messages, ai_messages)
+    
+    # 3. ACCURACY SCORE (5.0 max)
+    accuracy = calculate_accuracy(ai_messages)
+    
+    # 4. COMPLETENESS SCORE (5.0 max)
+    completeness = calculate_completeness(ai_messages)
+    
+    # 5. SENTIMENT ANALYSIS
+    sentiment = detect_sentiment(user_messages)
+    
+    # 6. EMPATHY SCORE (5.0 max, only if negative sentiment)
+    empathy = calculate_empathy(ai_messages, sentiment)
+    
+    # 7. RESPONSE TIME (in seconds)
+    gaps = response_time_gaps(messages)
+    avg_response_time = calculate_response_time(messages, gaps)
+    max_response_time = max(gaps, default=0.0)
+    p95_response_time = percentile(gaps, 95)
+    
+    # 8. RESOLUTION RATE (Boolean)
+    resolved = detect_resolution(user_messages, ai_messages)
+    
+    # 9. ESCALATION NEED (Boolean)
+    escalation = detect_escalation_need(user_messages, ai_messages, sentiment, resolved)
+    
+    # 10. FALLBACK FREQUENCY (Count)
+    fallback_count = count_fallbacks(ai_messages)
+    
+    # 11. OVERALL SCORE (Average of key metrics)
+    overall = calculate_overall_score(clarity, relevance, accuracy, completeness, empathy)
+    
+    fields = {
+        'clarity_score': clarity,
+        'relevance_score': relevance,
+        'accuracy_score': accuracy,
+        'completeness_score': completeness,
+        'sentiment': sentiment,
+        'empathy_score': empathy,
+        'response_time_avg': avg_response_time,
+        'response_time_max': max_response_time,
+        'response_time_p95': p95_response_time,
+        'resolution_rate': resolved,
+        'escalation_need': escalation,
+        'fallback_frequency': fallback_count,
+        'overall_score': overall,
+    }
+    return fields, gaps
+
+
+def refine_scores(scored):
+    """
+    Lets the configured analyzer backend (settings.ANALYSIS_BACKEND) replace heuristic
+    scores, then recomputes the metrics derived from them.
+    scored: {conversation_id: (analysis fields, messages)}; fields are updated in place.
+    """
+    try:
+        overrides = get_backend().score_batch({
+            conversation_id: messages for conversation_id, (fields, messages) in scored.items()
+        })
+    except Exception as e:
+        print(f"Analyzer backend error, keeping heuristic scores: {e}")
+        return
+    
+    for conversation_id, values in overrides.items():
+        if conversation_id not in scored:
+            continue
+        fields, messages = scored[conversation_id]
+        fields.update(values)
+        
+        if 'sentiment' in values:
+            user_messages = [m for m in messages if m.sender == 'user']
+            ai_messages = [m for m in messages if m.sender == 'ai']
+            if 'empathy_score' not in values:
+                fields['empathy_score'] = calculate_empathy(ai_messages, fields['sentiment'])
+            fields['escalation_need'] = detect_escalation_need(
+                user_messages, ai_messages, fields['sentiment'], fields['resolution_rate']
+            )
+        
+        fields['overall_score'] = calculate_overall_score(
+            fields['clarity_score'], fields['relevance_score'], fields['accuracy_score'],
+            fields['completeness_score'], fields['empathy_score']
+        )
+
+
 # ========== HELPER FUNCTIONS ==========
 
 def calculate_clarity(ai_messages):
@@ -230,13 +377,10 @@ def calculate_empathy(ai_messages, sentiment):
     return min(score, 5.0)
 
 
-def calculate_response_time(messages):
+def response_time_gaps(messages):
     """
-    Calculate average response time between user and AI messages
+    Seconds between each user message and the AI reply that directly follows it
     """
-    if len(messages) < 2:
-        return 0.0
-    
     response_times = []
     prev_msg = None
     
@@ -246,11 +390,36 @@ def calculate_response_time(messages):
             response_times.append(time_diff)
         prev_msg = msg
     
+    return response_times
+
+
+def calculate_response_time(messages, response_times=None):
+    """
+    Calculate average response time between user and AI messages
+    """
+    if len(messages) < 2:
+        return 0.0
+    
+    if response_times is None:
+        response_times = response_time_gaps(messages)
+    
     if response_times:
         return sum(response_times) / len(response_times)
     return 0.0
 
 
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (0.0 for an empty list)
+    """
+    if not values:
+        return 0.0
+    
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
 def detect_resolution(user_messages, ai_messages):
     """
     Check if issue was resolved
@@ -0,0 +1,203 @@
+# analysis/backends.py
+import abc
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import json
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+# Fields a backend may override; everything else stays heuristic
+SCORE_FIELDS = ['clarity_score', 'relevance_score', 'accuracy_score', 'completeness_score', 'empathy_score']
+SENTIMENTS = ['positive', 'neutral', 'negative']
+
+
+class BaseAnalyzerBackend(abc.ABC):
+    """
+    Scores conversations on top of the keyword heuristics in analyzer.py.
+
+    score_batch() receives {conversation_id: [messages ordered by created_at]} and
+    returns {conversation_id: {field: value}} with the fields it wants to replace
+    (any of SCORE_FIELDS and 'sentiment'). Conversations it leaves out keep
+    their heuristic scores.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    @abc.abstractmethod
+    def score_batch(self, conversations):
+        ...
+
+
+class HeuristicBackend(BaseAnalyzerBackend):
+    """Default backend: keeps the heuristic scores as they are."""
+
+    def score_batch(self, conversations):
+        return {}
+
+
+class HTTPScoringBackend(BaseAnalyzerBackend):
+    """
+    Sends conversations to an HTTP scoring service (e.g. a hosted sentiment/classification model).
+
+    Request:  POST url  {"conversations": [{"id": "<key>", "messages": [{"sender": "user", "text": "..."}]}]}
+    Response: {"results": [{"id": "<key>", "scores": {"sentiment": "negative", "clarity_score": 3.5}}]}
+
+    A batch is split into requests of `batch_size` conversations, sent concurrently
+    (at most `max_concurrency` at a time) through one pooled httpx.AsyncClient, so
+    the requests of a batch reuse keep-alive connections. `headers` are sent with
+    every request (e.g. {"Authorization": "Bearer ..."}). `timeout` bounds each
+    request from the moment it starts; time spent waiting for a free slot doesn't
+    count. `batch_timeout`, if set, is an overall deadline for the whole batch.
+    Responses larger than `max_response_bytes` are abandoned. Conversations of
+    requests that fail, time out or are cut off keep their heuristic scores.
+    Results are cached by conversation content for `cache_timeout` seconds.
+    """
+
+    def __init__(self, url, batch_size=32, max_concurrency=4, timeout=5.0, batch_timeout=None,
+                 headers=None, max_response_bytes=10 * 1024 * 1024, cache_timeout=86400, **options):
+        super().__init__(**options)
+        self.url = url
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.batch_timeout = batch_timeout
+        self.headers = headers or {}
+        self.max_response_bytes = max_response_bytes
+        self.cache_timeout = cache_timeout
+
+    def score_batch(self, conversations):
+        keys = {conversation_id: self.cache_key(messages) for conversation_id, messages in conversations.items()}
+        cached = cache.get_many(list(keys.values()))
+
+        results = {}
+        payloads = {}
+        for conversation_id, messages in conversations.items():
+            if keys[conversation_id] in cached:
+                results[conversation_id] = cached[keys[conversation_id]]
+            else:
+                payloads[keys[conversation_id]] = [{'sender': m.sender, 'text': m.text} for m in messages]
+
+        if payloads:
+            scored = run_async(self.dispatch(payloads))
+            cache.set_many(scored, self.cache_timeout)
+            for conversation_id, key in keys.items():
+                if key in scored:
+                    results[conversation_id] = scored[key]
+
+        return results
+
+    @functools.cached_property
+    def ssl_context(self):
+        # Loading the CA bundle takes tens of milliseconds: once per backend, not once per batch
+        return httpx.create_ssl_context()
+
+    def cache_key(self, messages):
+        digest = hashlib.sha256(self.url.encode())
+        for m in messages:
+            digest.update(b'\0' + m.sender.encode() + b'\0' + m.text.encode())
+        return f'analysis-score:{digest.hexdigest()}'
+
+    async def dispatch(self, payloads):
+        """
+        {key: messages} -> {key: validated scores} for every conversation the service answered in time.
+        """
+        items = list(payloads.items())
+        chunks = [dict(items[i:i + self.batch_size]) for i in range(0, len(items), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+
+        async with httpx.AsyncClient(
+            headers=self.headers, timeout=self.timeout, limits=limits, verify=self.ssl_context
+        ) as client:
+            async def send(chunk):
+                # The deadline starts once a slot is free, so queued requests aren't charged for the wait
+                async with semaphore:
+                    return await asyncio.wait_for(self.post(client, chunk), self.timeout)
+
+            tasks = {asyncio.ensure_future(send(chunk)): chunk for chunk in chunks}
+            done, pending = await asyncio.wait(tasks, timeout=self.batch_timeout)
+            if pending:
+                for task in pending:
+                    task.cancel()
+                await asyncio.wait(pending)
+                late = sum(len(tasks[task]) for task in pending)
+                print(f"Scoring service missed the {self.batch_timeout}s batch deadline for {late} conversations, "
+                      f"using heuristics")
+
+        scored = {}
+        for task in done:
+            error = task.exception()
+            if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+                print(f"Scoring service took longer than {self.timeout}s for {len(tasks[task])} conversations, "
+                      f"using heuristics")
+            elif error is not None:
+                print(f"Scoring service failed for {len(tasks[task])} conversations, using heuristics: {error!r}")
+            else:
+                scored.update(task.result())
+        return scored
+
+    async def post(self, client, chunk):
+        body = {'conversations': [{'id': key, 'messages': messages} for key, messages in chunk.items()]}
+        async with client.stream('POST', self.url, json=body) as response:
+            response.raise_for_status()
+            content = bytearray()
+            async for part in response.aiter_bytes():
+                content += part
+                if len(content) > self.max_response_bytes:
+                    raise ValueError(f"Response exceeds {self.max_response_bytes} bytes")
+        data = json.loads(content)
+
+        scored = {}
+        for result in data.get('results', []):
+            if result.get('id') in chunk:
+                scores = clean_scores(result.get('scores') or {})
+                if scores:
+                    scored[result['id']] = scores
+        return scored
+
+
+def clean_scores(scores):
+    """
+    Keep only known fields with valid values; scores are clamped to 0.0 - 5.0.
+    """
+    cleaned = {}
+    for field in SCORE_FIELDS:
+        value = scores.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cleaned[field] = max(0.0, min(5.0, float(value)))
+    if scores.get('sentiment') in SENTIMENTS:
+        cleaned['sentiment'] = scores['sentiment']
+    return cleaned
+
+
+def run_async(coroutine):
+    """
+    Run a coroutine to completion from sync code, even if an event loop is already running here.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Backend configured by ANALYSIS_BACKEND = {'BACKEND': '<dotted path>', 'OPTIONS': {...}}.
+    OPTIONS keys are written in settings style (URL, BATCH_SIZE) and passed as lowercase keyword arguments.
+    """
+    global _backend
+    if _backend is None:
+        config = getattr(settings, 'ANALYSIS_BACKEND', {})
+        backend_class = import_string(config.get('BACKEND', 'analysis.backends.HeuristicBackend'))
+        _backend = backend_class(**{key.lower(): value for key, value in config.get('OPTIONS', {}).items()})
+    return _backend
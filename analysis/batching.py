@@ -0,0 +1,83 @@
+# analysis/batching.py
+import atexit
+import threading
+from django.conf import settings
+
+
+class AnalysisBatcher:
+    """
+    Buffers conversation ids in-process and hands them to `dispatch` in batches,
+    either once `max_size` ids are waiting or `max_wait_ms` after the first one arrived.
+    """
+
+    def __init__(self, dispatch, max_size=100, max_wait_ms=500):
+        self.dispatch = dispatch
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending = []
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, conversation_id):
+        with self.lock:
+            self.pending.append(conversation_id)
+            if len(self.pending) >= self.max_size:
+                batch = self._take()
+            else:
+                batch = None
+                if self.timer is None:
+                    self.timer = threading.Timer(self.max_wait, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if batch:
+            self._send(batch)
+
+    def flush(self):
+        with self.lock:
+            batch = self._take()
+        if batch:
+            self._send(batch)
+
+    def _take(self):
+        # Caller holds the lock
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        return batch
+
+    def _send(self, batch):
+        try:
+            self.dispatch(batch)
+        except Exception as e:
+            print(f"Failed to queue analysis batch {batch}: {e}")
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """
+    Process-wide batcher configured from ANALYSIS_BATCH_SIZE / ANALYSIS_BATCH_MAX_WAIT_MS.
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            from .tasks import analyze_conversations_batch
+
+            _batcher = AnalysisBatcher(
+                dispatch=analyze_conversations_batch.delay,
+                max_size=getattr(settings, 'ANALYSIS_BATCH_SIZE', 100),
+                max_wait_ms=getattr(settings, 'ANALYSIS_BATCH_MAX_WAIT_MS', 500),
+            )
+            # Don't lose buffered ids when the process shuts down
+            atexit.register(_batcher.flush)
+        return _batcher
+
+
+def schedule_analysis(conversation_id):
+    """
+    Queue a freshly ingested conversation for batched analysis.
+    """
+    get_batcher().add(conversation_id)
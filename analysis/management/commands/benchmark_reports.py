@@ -0,0 +1,73 @@
+# analysis/management/commands/benchmark_reports.py
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from analysis.models import Conversation, ConversationAnalysis
+from analysis.renderers import ORJSONRenderer
+from analysis.serializers import ConversationAnalysisSerializer, analysis_report_rows
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec rendered for /api/reports/: serializer + JSONRenderer vs values() + ORJSONRenderer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Analyses to generate (rolled back afterwards)")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per path; the best one is reported")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_rows(options['rows'])
+            queryset = ConversationAnalysis.objects.all().order_by('-created_at')
+
+            serializer_path = lambda: JSONRenderer().render(ConversationAnalysisSerializer(queryset, many=True).data)
+            fast_path = lambda: ORJSONRenderer().render(analysis_report_rows(queryset))
+
+            if serializer_path() != fast_path():
+                raise CommandError("Fast path output differs from the serializer output")
+
+            baseline = self.best_time(serializer_path, options['repeat'])
+            fast = self.best_time(fast_path, options['repeat'])
+            rows = queryset.count()
+
+            self.stdout.write(f"Rows rendered:       {rows}")
+            self.stdout.write(f"Serializer path:     {rows / baseline:,.0f} rows/sec ({baseline * 1000:.1f} ms)")
+            self.stdout.write(f"values() + orjson:   {rows / fast:,.0f} rows/sec ({fast * 1000:.1f} ms)")
+            self.stdout.write(self.style.SUCCESS(f"Speedup: {baseline / fast:.1f}x (byte-identical output)"))
+
+            transaction.set_rollback(True)
+
+    def create_rows(self, count):
+        conversations = Conversation.objects.bulk_create(
+            [Conversation(title=f"Benchmark {i}") for i in range(count)]
+        )
+        ConversationAnalysis.objects.bulk_create([
+            ConversationAnalysis(
+                conversation=conversation,
+                clarity_score=round(random.uniform(1, 5), 2),
+                relevance_score=round(random.uniform(1, 5), 2),
+                accuracy_score=round(random.uniform(1, 5), 2),
+                completeness_score=round(random.uniform(1, 5), 2),
+                sentiment=random.choice(['positive', 'neutral', 'negative']),
+                empathy_score=round(random.uniform(0, 5), 2),
+                # Unrounded, like the analyzer stores them; many land below 1e-4
+                response_time_avg=random.expovariate(20000),
+                response_time_max=random.expovariate(5000),
+                response_time_p95=random.expovariate(8000),
+                resolution_rate=random.random() < 0.7,
+                escalation_need=random.random() < 0.2,
+                fallback_frequency=random.randint(0, 3),
+                overall_score=round(random.uniform(1, 5), 2),
+            )
+            for conversation in conversations
+        ])
+
+    @staticmethod
+    def best_time(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,108 @@
+# analysis/management/commands/manage_partitions.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from analysis import partitions
+from analysis.models import Conversation, Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly message partitions and enforce retention. On PostgreSQL old "
+        "months are detached and dropped; other databases fall back to batched DELETEs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help="Future monthly partitions to keep ready")
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help="Drop messages and conversations older than this many whole months")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per DELETE when partitions are unavailable")
+        parser.add_argument('--dry-run', action='store_true', help="Only print what would be done")
+
+    def handle(self, *args, **options):
+        if options['retain_months'] is not None and options['retain_months'] < 1:
+            raise CommandError("--retain-months must be at least 1")
+
+        current = partitions.month_start(timezone.now())
+        cutoff = None
+        if options['retain_months'] is not None:
+            cutoff = partitions.add_months(current, -options['retain_months'])
+
+        if partitions.supports_partitioning():
+            with connection.cursor() as cursor:
+                if not partitions.is_partitioned(cursor):
+                    raise CommandError(f"{partitions.PARTITIONED_TABLE} is not partitioned; run migrations first")
+                self.create_upcoming(cursor, current, options['months_ahead'], options['dry_run'])
+                if cutoff:
+                    self.drop_expired(cursor, cutoff, options)
+        else:
+            self.stdout.write(f"{connection.vendor} has no table partitioning; skipping partition creation")
+            if cutoff:
+                self.delete_in_batches(Message.objects.filter(created_at__lt=cutoff), options)
+
+        if cutoff:
+            self.delete_in_batches(Conversation.objects.filter(created_at__lt=cutoff), options)
+
+    def create_upcoming(self, cursor, current, months_ahead, dry_run):
+        existing = partitions.monthly_partitions(cursor)
+        for offset in range(months_ahead + 1):
+            month = partitions.add_months(current, offset)
+            if month in existing:
+                continue
+            name = partitions.partition_name(month)
+            # Rows written before the partition existed sit in the default partition
+            # and block PARTITION OF, so they are moved into the new table instead
+            stranded = partitions.month_rows_in_default(cursor, month)
+            if dry_run:
+                moving = f" from {stranded} messages in {partitions.DEFAULT_PARTITION}" if stranded else ""
+                self.stdout.write(f"Would create {name}{moving}")
+                continue
+            with transaction.atomic():
+                if stranded:
+                    moved = partitions.split_month_from_default(cursor, month)
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Created {name} from {moved} messages in {partitions.DEFAULT_PARTITION}"
+                    ))
+                else:
+                    partitions.create_month_partition(cursor, month)
+                    self.stdout.write(self.style.SUCCESS(f"Created {name}"))
+
+    def drop_expired(self, cursor, cutoff, options):
+        for month, name in sorted(partitions.monthly_partitions(cursor).items()):
+            if partitions.add_months(month, 1) > cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"Would drop {name}")
+                continue
+            with transaction.atomic():
+                partitions.drop_partition(cursor, name)
+            self.stdout.write(self.style.SUCCESS(f"Dropped {name}"))
+
+        # Expired rows of months that never had a partition can't be dropped with one
+        if options['dry_run']:
+            expired = partitions.expired_rows_in_default(cursor, cutoff)
+            self.stdout.write(f"Would delete {expired} messages from {partitions.DEFAULT_PARTITION}")
+            return
+        total = 0
+        while True:
+            with transaction.atomic():
+                deleted = partitions.delete_expired_from_default(cursor, cutoff, options['batch_size'])
+            if not deleted:
+                break
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} messages from {partitions.DEFAULT_PARTITION}"))
+
+    def delete_in_batches(self, queryset, options):
+        label = queryset.model._meta.verbose_name_plural
+        if options['dry_run']:
+            self.stdout.write(f"Would delete {queryset.count()} {label}")
+            return
+
+        total = 0
+        while True:
+            ids = list(queryset.order_by().values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            queryset.model.objects.filter(id__in=ids).delete()
+            total += len(ids)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} {label}"))
@@ -0,0 +1,10 @@
+# analysis/management/commands/run_daily_analysis.py
+from django.core.management.base import BaseCommand
+from analysis.tasks import run_daily_analysis
+
+
+class Command(BaseCommand):
+    help = "Analyse every conversation waiting in the pending-analysis queue (same as the nightly Celery task)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(run_daily_analysis()))
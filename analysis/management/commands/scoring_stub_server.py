@@ -0,0 +1,70 @@
+# analysis/management/commands/scoring_stub_server.py
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from analysis.analyzer import detect_sentiment
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for an HTTP scoring service, for trying HTTPScoringBackend "
+        "without a model. Answers every conversation with fixed scores and keyword sentiment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay-ms', type=int, default=0, help="Artificial latency per request (to exercise timeouts)")
+        parser.add_argument('--score', type=float, default=4.0, help="Value returned for every score field")
+
+    def handle(self, *args, **options):
+        delay = options['delay_ms'] / 1000
+        score = options['score']
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like a real service
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                conversations = json.loads(self.rfile.read(length) or b'{}').get('conversations', [])
+                time.sleep(delay)
+
+                results = []
+                for conversation in conversations:
+                    user_messages = [StubMessage(m['text']) for m in conversation['messages'] if m['sender'] == 'user']
+                    results.append({
+                        'id': conversation['id'],
+                        'scores': {
+                            'sentiment': detect_sentiment(user_messages),
+                            'clarity_score': score,
+                            'relevance_score': score,
+                            'accuracy_score': score,
+                            'completeness_score': score,
+                        },
+                    })
+
+                body = json.dumps({'results': results}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                stdout.write(f"Scored {len(conversations)} conversations")
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Scoring stub listening on http://127.0.0.1:{options['port']}/score")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+class StubMessage:
+    def __init__(self, text):
+        self.text = text
@@ -0,0 +1,147 @@
+# analysis/metrics.py
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection, transaction
+from .models import ConversationAnalysis, MetricSketch
+from .sketches import QuantileSketch, HyperLogLog
+
+# Sketches are kept per hour and merged on read, so ranges resolve to whole hours
+BUCKET_SECONDS = 3600
+
+# Per-conversation values recorded for every analysis ("response_time" is every user -> AI gap)
+SCORE_METRICS = [
+    'clarity_score', 'relevance_score', 'accuracy_score',
+    'completeness_score', 'empathy_score', 'overall_score',
+]
+METRICS = ['response_time'] + SCORE_METRICS
+
+
+def bucket_for(moment):
+    """
+    Start of the time bucket containing `moment`.
+    """
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % BUCKET_SECONDS, tz=dt_timezone.utc)
+
+
+def analysis_samples(analysis, response_gaps):
+    """
+    Sketch samples contributed by one analysis: {metric: [values]}
+    """
+    samples = {metric: [getattr(analysis, metric)] for metric in SCORE_METRICS}
+    samples['response_time'] = list(response_gaps)
+    return samples
+
+
+def record_new_analyses(samples_by_conversation, created_at):
+    """
+    Record samples only for conversations whose analysis has not been sketched yet.
+    A conversation contributes to the distributions once, with its first analysis;
+    re-analysing it (or a retried job) leaves the sketches alone.
+    """
+    with transaction.atomic():
+        new_ids = claim_unsketched(list(samples_by_conversation))
+        if new_ids:
+            record_samples(
+                {conversation_id: samples_by_conversation[conversation_id] for conversation_id in new_ids},
+                created_at
+            )
+    return new_ids
+
+
+def claim_unsketched(conversation_ids):
+    """
+    Flip `sketched` on the given analyses and return the conversation ids that were not sketched yet.
+    A single UPDATE ... RETURNING, so concurrent workers can never both claim one analysis.
+    """
+    if not conversation_ids:
+        return []
+
+    # Backends that support INSERT ... RETURNING (PostgreSQL, SQLite >= 3.35) support it on UPDATE too
+    if connection.features.can_return_columns_from_insert:
+        table = ConversationAnalysis._meta.db_table
+        placeholders = ', '.join(['%s'] * len(conversation_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET sketched = %s "
+                f"WHERE sketched = %s AND conversation_id IN ({placeholders}) "
+                f"RETURNING conversation_id",
+                [True, False, *conversation_ids]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # No RETURNING support: lock the rows first (a no-op where row locks don't exist)
+    pending = ConversationAnalysis.objects.select_for_update().filter(
+        conversation_id__in=conversation_ids, sketched=False
+    )
+    new_ids = list(pending.values_list('conversation_id', flat=True))
+    ConversationAnalysis.objects.filter(conversation_id__in=new_ids).update(sketched=True)
+    return new_ids
+
+
+def record_samples(samples_by_conversation, created_at):
+    """
+    Merge samples into the sketches of the bucket each conversation happened in,
+    so ranges select conversations by when they took place, not when they were analysed.
+
+    samples_by_conversation: {conversation_id: {metric: [values]}}
+    created_at: {conversation_id: conversation created_at}
+    Each (bucket, metric) row is read, merged and written once per call, so callers
+    analysing many conversations should pass them together.
+    """
+    sketches = {}
+    for conversation_id, samples in samples_by_conversation.items():
+        bucket = bucket_for(created_at[conversation_id])
+        for metric, values in samples.items():
+            if not values:
+                continue
+            quantiles, distinct = sketches.setdefault((bucket, metric), (QuantileSketch(), HyperLogLog()))
+            for value in values:
+                quantiles.add(value)
+            distinct.add(conversation_id)
+
+    with transaction.atomic():
+        for (bucket, metric), (quantiles, distinct) in sorted(sketches.items()):
+            row, created = MetricSketch.objects.select_for_update().get_or_create(
+                bucket_start=bucket, metric=metric
+            )
+            if not created:
+                quantiles.merge(QuantileSketch.from_dict(row.quantiles))
+                distinct.merge(HyperLogLog.from_string(row.distinct))
+            row.quantiles = quantiles.to_dict()
+            row.distinct = distinct.to_string()
+            row.save(update_fields=['quantiles', 'distinct', 'updated_at'])
+
+
+def summarize(metric, start, end, quantiles=(0.5, 0.95, 0.99)):
+    """
+    Merge the sketches of every bucket overlapping [start, end) and read quantiles off the result.
+    """
+    merged = QuantileSketch()
+    distinct = HyperLogLog()
+
+    rows = MetricSketch.objects.filter(
+        metric=metric,
+        bucket_start__gte=bucket_for(start),
+        bucket_start__lt=end,
+    ).values_list('quantiles', 'distinct')
+
+    for quantiles_data, distinct_data in rows:
+        merged.merge(QuantileSketch.from_dict(quantiles_data))
+        distinct.merge(HyperLogLog.from_string(distinct_data))
+
+    return {
+        'metric': metric,
+        'count': merged.count,
+        'distinct_conversations': distinct.count() if merged.count else 0,
+        'min': merged.min,
+        'max': merged.max,
+        'percentiles': {format_quantile(q): merged.quantile(q) for q in quantiles},
+        'relative_error': merged.relative_accuracy,
+    }
+
+
+def format_quantile(q):
+    """
+    0.5 -> "p50", 0.999 -> "p99.9"
+    """
+    return 'p' + f"{q * 100:g}"
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender', models.CharField(max_length=20)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='analysis.conversation')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConversationAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clarity_score', models.FloatField(default=0.0)),
+                ('relevance_score', models.FloatField(default=0.0)),
+                ('accuracy_score', models.FloatField(default=0.0)),
+                ('completeness_score', models.FloatField(default=0.0)),
+                ('sentiment', models.CharField(blank=True, max_length=20, null=True)),
+                ('empathy_score', models.FloatField(default=0.0)),
+                ('response_time_avg', models.FloatField(default=0.0)),
+                ('resolution_rate', models.BooleanField(default=False)),
+                ('escalation_need', models.BooleanField(default=False)),
+                ('fallback_frequency', models.IntegerField(default=0)),
+                ('overall_score', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis', to='analysis.conversation')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE analysis_message_fts USING fts5(
+        text,
+        conversation_id UNINDEXED,
+        content='analysis_message',
+        content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER analysis_message_fts_ai AFTER INSERT ON analysis_message BEGIN
+        INSERT INTO analysis_message_fts(rowid, text, conversation_id)
+        VALUES (new.id, new.text, new.conversation_id);
+    END
+    """,
+    """
+    CREATE TRIGGER analysis_message_fts_ad AFTER DELETE ON analysis_message BEGIN
+        INSERT INTO analysis_message_fts(analysis_message_fts, rowid, text, conversation_id)
+        VALUES ('delete', old.id, old.text, old.conversation_id);
+    END
+    """,
+    """
+    CREATE TRIGGER analysis_message_fts_au AFTER UPDATE ON analysis_message BEGIN
+        INSERT INTO analysis_message_fts(analysis_message_fts, rowid, text, conversation_id)
+        VALUES ('delete', old.id, old.text, old.conversation_id);
+        INSERT INTO analysis_message_fts(rowid, text, conversation_id)
+        VALUES (new.id, new.text, new.conversation_id);
+    END
+    """,
+    # Index messages that existed before this migration
+    "INSERT INTO analysis_message_fts(analysis_message_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS analysis_message_fts_au",
+    "DROP TRIGGER IF EXISTS analysis_message_fts_ad",
+    "DROP TRIGGER IF EXISTS analysis_message_fts_ai",
+    "DROP TABLE IF EXISTS analysis_message_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX analysis_message_text_fts ON analysis_message "
+    "USING GIN (to_tsvector('english', text))",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS analysis_message_text_fts",
+]
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_statements({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0002_message_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('metric', models.CharField(max_length=50)),
+                ('quantiles', models.JSONField(default=dict)),
+                ('distinct', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['bucket_start', 'metric'],
+            },
+        ),
+        migrations.AddField(
+            model_name='conversationanalysis',
+            name='response_time_max',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='conversationanalysis',
+            name='response_time_p95',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddConstraint(
+            model_name='metricsketch',
+            constraint=models.UniqueConstraint(fields=('metric', 'bucket_start'), name='unique_metric_bucket'),
+        ),
+    ]
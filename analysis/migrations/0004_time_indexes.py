@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0003_response_time_sketches'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversationanalysis',
+            index=models.Index(fields=['created_at'], name='analysis_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at'], name='message_conversation_created'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at'], name='message_created_at'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+from django.db import migrations
+from django.utils import timezone
+from analysis import partitions
+
+# Converts analysis_message into a table range-partitioned by month on created_at.
+# PostgreSQL only: other backends keep the plain table (indexed on created_at by 0004).
+# PostgreSQL requires the partition key in the primary key, so it becomes (id, created_at);
+# ids still come from the same sequence and stay unique.
+
+# Created by 0002 with raw SQL, so the schema editor doesn't know about it
+FTS_INDEX = "CREATE INDEX analysis_message_text_fts ON analysis_message USING GIN (to_tsvector('english', text))"
+
+MONTHS_AHEAD = 3
+
+
+def rebuild_message_table(schema_editor, model, partitioned):
+    table = model._meta.db_table
+    old_table = f'{table}_old'
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+        cursor.execute(f"SELECT MIN(created_at) FROM {old_table}")
+        oldest = cursor.fetchone()[0]
+
+        if partitioned:
+            cursor.execute(
+                f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+                f"PARTITION BY RANGE (created_at)"
+            )
+
+            # Partitions must exist before the copy: a filled default partition blocks new ones
+            month = partitions.month_start(oldest or timezone.now())
+            last = partitions.add_months(partitions.month_start(timezone.now()), MONTHS_AHEAD)
+            while month <= last:
+                partitions.create_month_partition(cursor, month)
+                month = partitions.add_months(month, 1)
+            partitions.create_default_partition(cursor)
+        else:
+            cursor.execute(f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING IDENTITY)")
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+        )
+        cursor.execute(f"DROP TABLE {old_table}")
+
+        # Added after the drop so the constraint can take the old table's name
+        primary_key = "id, created_at" if partitioned else "id"
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})")
+
+        # Recreate the FK and indexes through the schema editor so they get exactly the
+        # (truncated, hashed) names Django gave them in 0001 and 0004
+        conversation = model._meta.get_field('conversation')
+        schema_editor.execute(schema_editor._create_fk_sql(model, conversation, "_fk_%(to_table)s_%(to_column)s"))
+        for sql in schema_editor._model_indexes_sql(model):
+            schema_editor.execute(sql)
+        cursor.execute(FTS_INDEX)
+
+
+def partition_messages(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    rebuild_message_table(schema_editor, apps.get_model('analysis', 'Message'), partitioned=True)
+
+
+def unpartition_messages(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    rebuild_message_table(schema_editor, apps.get_model('analysis', 'Message'), partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    # DDL and the data copy must run in one transaction
+    atomic = True
+
+    dependencies = [
+        ('analysis', '0004_time_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_messages, unpartition_messages),
+    ]
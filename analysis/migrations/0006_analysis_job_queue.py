@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def enqueue_unanalysed(apps, schema_editor):
+    # One last anti-join to seed the queue with conversations that were never analysed
+    Conversation = apps.get_model('analysis', 'Conversation')
+    AnalysisJob = apps.get_model('analysis', 'AnalysisJob')
+    ids = Conversation.objects.filter(analysis__isnull=True).values_list('id', flat=True)
+    batch = []
+    for conversation_id in ids.iterator(chunk_size=5000):
+        batch.append(AnalysisJob(conversation_id=conversation_id))
+        if len(batch) >= 5000:
+            AnalysisJob.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        AnalysisJob.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0005_partition_messages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('unanalyzable', 'Unanalyzable'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_by', models.CharField(blank=True, max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_job', to='analysis.conversation')),
+            ],
+            options={
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='job_status_available')],
+            },
+        ),
+        migrations.RunPython(enqueue_unanalysed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:24
+
+from django.db import migrations, models
+
+
+def mark_existing_sketched(apps, schema_editor):
+    # Analyses written before this migration already fed the sketches
+    ConversationAnalysis = apps.get_model('analysis', 'ConversationAnalysis')
+    ConversationAnalysis.objects.update(sketched=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0006_analysis_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationanalysis',
+            name='sketched',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_sketched, migrations.RunPython.noop),
+    ]
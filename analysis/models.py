@@ -1,5 +1,6 @@
 # analysis/models.py
 from django.db import models
+from django.utils import timezone
 
 class Conversation(models.Model):
     """Stores a single conversation session."""
@@ -29,6 +30,12 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        # On PostgreSQL this table is range-partitioned by month on created_at
+        # (migration 0005_partition_messages, maintained by `manage.py manage_partitions`)
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='message_conversation_created'),
+            models.Index(fields=['created_at'], name='message_created_at'),
+        ]
 
     def __str__(self):
         return f"{self.sender}: {self.text[:50]}..."
@@ -48,6 +55,8 @@ class ConversationAnalysis(models.Model):
     sentiment = models.CharField(max_length=20, null=True, blank=True)  # positive, neutral, negative
     empathy_score = models.FloatField(default=0.0)
     response_time_avg = models.FloatField(default=0.0)
+    response_time_max = models.FloatField(default=0.0)
+    response_time_p95 = models.FloatField(default=0.0)
 
     # Resolution
     resolution_rate = models.BooleanField(default=False)
@@ -60,8 +69,64 @@ class ConversationAnalysis(models.Model):
     overall_score = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Set once this conversation's samples are in the MetricSketch rows, so re-analysis doesn't count it twice
+    sketched = models.BooleanField(default=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='analysis_created_at'),
+        ]
 
     def __str__(self):
         return f"Analysis for Conversation {self.conversation.id}"
+
+
+class MetricSketch(models.Model):
+    """Mergeable quantile sketch and distinct counter for one metric over one time bucket."""
+    bucket_start = models.DateTimeField()
+    metric = models.CharField(max_length=50)  # e.g. "response_time", "overall_score"
+    quantiles = models.JSONField(default=dict)  # QuantileSketch.to_dict()
+    distinct = models.TextField(blank=True)  # HyperLogLog.to_string() over conversation ids
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['bucket_start', 'metric']
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'bucket_start'], name='unique_metric_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} @ {self.bucket_start:%Y-%m-%d %H:%M}"
+
+
+class AnalysisJob(models.Model):
+    """Work-queue entry for a conversation that still needs analysis (deleted once analysed)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    UNANALYZABLE = 'unanalyzable'  # terminal: no user or no AI messages
+    FAILED = 'failed'  # terminal: gave up after ANALYSIS_QUEUE_MAX_ATTEMPTS
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (UNANALYZABLE, 'Unanalyzable'),
+        (FAILED, 'Failed'),
+    ]
+
+    conversation = models.OneToOneField(Conversation, on_delete=models.CASCADE, related_name="analysis_job")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # not claimable before this (backoff)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='job_status_available'),
+        ]
+
+    def __str__(self):
+        return f"Job for Conversation {self.conversation_id} ({self.status})"
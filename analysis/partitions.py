@@ -0,0 +1,142 @@
+# analysis/partitions.py
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection
+
+# Messages are range-partitioned by month on created_at (PostgreSQL only).
+# Partitions are named analysis_message_pYYYY_MM and cover [month start, next month start) in UTC;
+# rows outside every monthly partition land in analysis_message_default.
+PARTITIONED_TABLE = 'analysis_message'
+DEFAULT_PARTITION = f'{PARTITIONED_TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{PARTITIONED_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def supports_partitioning():
+    return connection.vendor == 'postgresql'
+
+
+def month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PARTITIONED_TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = %s",
+        [PARTITIONED_TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+def monthly_partitions(cursor):
+    """
+    {month start: partition name} for every monthly partition currently attached.
+    """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s",
+        [PARTITIONED_TABLE]
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions[month] = name
+    return partitions
+
+
+def create_month_partition(cursor, month):
+    """
+    Create the partition for `month` if missing. Fails if the default partition
+    already holds rows for that month; see split_month_from_default.
+    """
+    month = month_start(month)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARTITIONED_TABLE} "
+        f"FOR VALUES FROM ({timestamp_literal(month)}) TO ({timestamp_literal(add_months(month, 1))})"
+    )
+
+
+def timestamp_literal(moment):
+    """
+    UTC timestamp as a SQL literal. DDL can't take bind parameters, and this is
+    formatted from the date parts alone, so there is nothing to escape.
+    """
+    return f"'{moment.astimezone(dt_timezone.utc):%Y-%m-%d %H:%M:%S}+00'"
+
+
+def month_rows_in_default(cursor, month):
+    """
+    Rows for `month` that landed in the default partition because no partition
+    covered them when they were written. While there are any, the month's
+    partition can't be created with PARTITION OF.
+    """
+    month = month_start(month)
+    cursor.execute(
+        f"SELECT COUNT(*) FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s",
+        [month, add_months(month, 1)]
+    )
+    return cursor.fetchone()[0]
+
+
+def split_month_from_default(cursor, month):
+    """
+    Create the partition for `month` out of the rows sitting in the default
+    partition: they are moved into a new table, which is then attached.
+    Returns the number of rows moved.
+    """
+    month = month_start(month)
+    name = partition_name(month)
+    start, end = timestamp_literal(month), timestamp_literal(add_months(month, 1))
+    cursor.execute(f"CREATE TABLE {name} (LIKE {PARTITIONED_TABLE})")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= {start} AND created_at < {end} "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    )
+    moved = cursor.rowcount
+    # Attaching builds the partition's copies of the parent's indexes and FK
+    cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})")
+    return moved
+
+
+def expired_rows_in_default(cursor, cutoff):
+    cursor.execute(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION} WHERE created_at < %s", [cutoff])
+    return cursor.fetchone()[0]
+
+
+def delete_expired_from_default(cursor, cutoff, batch_size):
+    """
+    Delete up to `batch_size` rows older than `cutoff` from the default partition.
+    Months without their own partition can't be dropped, so their rows expire here.
+    """
+    cursor.execute(
+        f"DELETE FROM {DEFAULT_PARTITION} WHERE ctid = ANY(ARRAY("
+        f"SELECT ctid FROM {DEFAULT_PARTITION} WHERE created_at < %s LIMIT %s))",
+        [cutoff, batch_size]
+    )
+    return cursor.rowcount
+
+
+def create_default_partition(cursor):
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARTITIONED_TABLE} DEFAULT")
+
+
+def drop_partition(cursor, name):
+    """
+    Detach a partition and drop it: removes a whole month of messages without a DELETE.
+    """
+    cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}")
+    cursor.execute(f"DROP TABLE {name}")
@@ -0,0 +1,107 @@
+# analysis/renderers.py
+import io
+import re
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # fall back to the stock DRF classes
+    orjson = None
+
+# orjson (as pinned in requirements.txt) spells two kinds of floats differently
+# from json.dumps, which uses repr(): values in [1e-5, 1e-4) are written
+# positionally (0.000064 vs 6.4e-05) and single-digit negative exponents are not
+# padded (1e-7 vs 1e-07). Response times land in that range all the time, so they
+# are respelled in the orjson output rather than rendering the page twice. Each
+# pattern starts with a literal, which lets the regex engine skip ahead instead
+# of trying every byte.
+SMALL_FLOAT = re.compile(rb'0\.0000([1-9])(\d*)')
+SHORT_EXPONENT = re.compile(rb'e-(\d)(?!\d)')
+DIGITS_AND_POINT = b'0123456789.'
+
+
+def respell_floats(ret):
+    edits = []
+    if b'0.0000' in ret:
+        edits += [
+            (m.start(), m.end(), m.group(1) + (b'.' + m.group(2) if m.group(2) else b'') + b'e-05')
+            for m in SMALL_FLOAT.finditer(ret)
+            # Skip the tail of a larger number such as 10.00001
+            if not m.start() or ret[m.start() - 1] not in DIGITS_AND_POINT
+        ]
+    if b'e-' in ret:
+        edits += [(m.start(), m.end(), b'e-0' + m.group(1)) for m in SHORT_EXPONENT.finditer(ret)]
+    if not edits:
+        return ret
+    edits.sort()
+
+    # Blank out escaped backslashes and quotes (same length) so every quote left
+    # opens or closes a string, then drop matches that sit inside one
+    skeleton = ret.replace(b'\\\\', b'  ').replace(b'\\"', b'  ') if b'\\' in ret else ret
+    chunks, last, counted, quotes = [], 0, 0, 0
+    for start, end, text in edits:
+        quotes += skeleton.count(b'"', counted, start)
+        counted = start
+        if quotes % 2:
+            continue
+        chunks += (ret[last:start], text)
+        last = end
+    chunks.append(ret[last:])
+    return b''.join(chunks)
+
+
+# orjson decodes integers outside the 64-bit range as floats, json.loads keeps them
+# exact. Any run of 19+ digits might be one, so such bodies go to the stock parser.
+# Folding every digit to "0" first is much cheaper than a regex over large bodies.
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+LONG_DIGIT_RUN = b'0' * 19
+
+
+def may_overflow_int64(data):
+    return LONG_DIGIT_RUN in data.translate(DIGITS_TO_ZERO)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes as DRF's renderer, encoded with orjson.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # Non-string keys are left to json.dumps: orjson would write float keys
+            # inside strings, where respell_floats can't tell them from text
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except (orjson.JSONEncodeError, TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return respell_floats(ret).replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser decoding request bodies with orjson.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        data = stream.read()
+        if may_overflow_int64(data):
+            return super().parse(io.BytesIO(data), media_type, parser_context)
+
+        try:
+            # orjson rejects NaN/Infinity, matching STRICT_JSON
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Re-parse invalid bodies with the stock parser so clients see the same error messages
+            return super().parse(io.BytesIO(data), media_type, parser_context)
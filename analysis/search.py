@@ -0,0 +1,51 @@
+# analysis/search.py
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from .models import Conversation, Message
+
+# Full-text index over Message.text, created by migration 0002_message_search:
+# - SQLite:     FTS5 external-content table kept in sync by triggers
+# - PostgreSQL: GIN index on to_tsvector('english', text)
+FTS_TABLE = 'analysis_message_fts'
+TS_CONFIG = 'english'
+
+
+def fts5_phrase(query):
+    """
+    Quote a raw user query as a single FTS5 phrase so operators are not interpreted.
+    """
+    return '"' + query.replace('"', '""') + '"'
+
+
+def matching_conversation_ids(query):
+    """
+    Returns (sql, params) selecting the conversation ids whose messages contain the phrase.
+    """
+    vendor = connection.vendor
+
+    if vendor == 'sqlite':
+        sql = f"SELECT conversation_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        return sql, [fts5_phrase(query)]
+
+    if vendor == 'postgresql':
+        sql = (
+            f"SELECT conversation_id FROM {Message._meta.db_table} "
+            f"WHERE to_tsvector('{TS_CONFIG}', text) @@ phraseto_tsquery('{TS_CONFIG}', %s)"
+        )
+        return sql, [query]
+
+    # No full-text index on other backends, fall back to a substring scan
+    qs = Message.objects.filter(text__icontains=query).order_by().values('conversation_id')
+    return qs.query.sql_with_params()
+
+
+def search_conversations(query):
+    """
+    Conversations with at least one message matching the phrase, joined with their analysis.
+    """
+    sql, params = matching_conversation_ids(query)
+    return (
+        Conversation.objects
+        .filter(id__in=RawSQL(sql, params))
+        .select_related('analysis')
+    )
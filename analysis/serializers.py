@@ -1,4 +1,5 @@
 # analysis/serializers.py
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Conversation, Message, ConversationAnalysis
 
@@ -22,8 +23,10 @@ class ConversationSerializer(serializers.ModelSerializer):
         # Handles nested message creation from uploaded JSON
         messages_data = validated_data.pop('messages',[])
         conversation = Conversation.objects.create(**validated_data)
-        for message_data in messages_data:
-            Message.objects.create(conversation=conversation, **message_data)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, **message_data)
+            for message_data in messages_data
+        ])
         return conversation
 
 class ConversationAnalysisSerializer(serializers.ModelSerializer):
@@ -36,6 +39,31 @@ class ConversationAnalysisSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'conversation_id', 'clarity_score', 'relevance_score', 
             'accuracy_score', 'completeness_score', 'sentiment', 
-            'empathy_score', 'response_time_avg', 'resolution_rate', 
+            'empathy_score', 'response_time_avg', 'response_time_max',
+            'response_time_p95', 'resolution_rate', 
             'escalation_need', 'fallback_frequency', 'overall_score', 'created_at'
-        ]
\ No newline at end of file
+        ]
+
+def analysis_report_rows(queryset):
+    """
+    Fast read path for ConversationAnalysisSerializer: fetches plain dicts with values()
+    and only converts what the serializer would (timestamps), producing identical output.
+    """
+    fields = ConversationAnalysisSerializer.Meta.fields
+    # Resolve the active timezone once instead of per row
+    created_at = serializers.DateTimeField(default_timezone=timezone.get_current_timezone())
+    rows = list(queryset.values(*fields))
+    for row in rows:
+        if row['created_at'] is not None:
+            row['created_at'] = created_at.to_representation(row['created_at'])
+    return rows
+
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    # A matching conversation together with its analysis (null if not analysed yet)
+    conversation_id = serializers.ReadOnlyField(source='id')
+    analysis = ConversationAnalysisSerializer(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['conversation_id', 'title', 'created_at', 'analysis']
@@ -0,0 +1,139 @@
+# analysis/sketches.py
+import base64
+import hashlib
+import math
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error (DDSketch-style log buckets).
+
+    Every quantile estimate is within `relative_accuracy` of the true value, and
+    two sketches merge exactly by adding bucket counts.
+    """
+
+    MIN_INDEXABLE = 1e-9
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = max(0.0, float(value))
+        if value < self.MIN_INDEXABLE:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q):
+        """
+        Estimated value at quantile q (0.0 - 1.0), or None for an empty sketch.
+        """
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        value = self.max
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                break
+
+        return max(self.min, min(self.max, value))
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            # JSON object keys must be strings
+            'bins': {str(index): count for index, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('relative_accuracy', 0.01))
+        sketch.bins = {int(index): count for index, count in data.get('bins', {}).items()}
+        sketch.zero_count = data.get('zero_count', 0)
+        sketch.count = data.get('count', 0)
+        sketch.min = data.get('min')
+        sketch.max = data.get('max')
+        return sketch
+
+
+class HyperLogLog:
+    """
+    Distinct counter using 2^precision one-byte registers (~1.6% standard error at precision 12).
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = bytearray(self.num_registers)
+
+    def add(self, value):
+        digest = hashlib.sha1(str(value).encode('utf-8')).digest()
+        hashed = int.from_bytes(digest[:8], 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost 1-bit in the remaining bits
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge counters with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # Small-range correction: linear counting over empty registers
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_string(self):
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+
+    @classmethod
+    def from_string(cls, data, precision=12):
+        if not data:
+            return cls(precision)
+        registers = bytearray(base64.b64decode(data))
+        counter = cls(len(registers).bit_length() - 1)
+        counter.registers = registers
+        return counter
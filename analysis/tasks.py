@@ -1,22 +1,23 @@
 
 from celery import shared_task
-from .models import Conversation
-from .analyzer import perform_analysis
+from django.conf import settings
+from .analyzer import perform_analysis, analyze_conversations
+from .work_queue import claim_jobs, finish_jobs, process_claimed
 
 @shared_task
 def run_daily_analysis():
     """
-    Celery task: Runs analysis on all unprocessed conversations
+    Celery task: Drains the pending-analysis queue in claimed batches.
+    Safe to run on several workers at once; each claims different jobs.
     """
-    unprocessed = Conversation.objects.filter(analysis__isnull=True)
+    batch_size = getattr(settings, 'ANALYSIS_BATCH_SIZE', 100)
     
     count = 0
-    for convo in unprocessed:
-        try:
-            perform_analysis(convo.id)
-            count += 1
-        except Exception as e:
-            print(f"Failed to analyze conversation {convo.id}: {e}")
+    while True:
+        conversation_ids = claim_jobs(batch_size)
+        if not conversation_ids:
+            break
+        count += len(process_claimed(conversation_ids))
     
     return f"Successfully analyzed {count} conversations"
 
@@ -26,4 +27,16 @@ def analyze_conversation_async(conversation_id):
     analysis = perform_analysis(conversation_id)
     if not analysis:
         return {"status": "failure", "conversation_id": conversation_id}
-    return {"status": "success", "conversation_id": conversation_id, "analysis_id": analysis.id}
\ No newline at end of file
+    finish_jobs(analysed=[conversation_id])
+    return {"status": "success", "conversation_id": conversation_id, "analysis_id": analysis.id}
+
+
+@shared_task
+def analyze_conversations_batch(conversation_ids):
+    """
+    Celery task: Analyses a micro-batch of newly ingested conversations
+    """
+    analysed, skipped = analyze_conversations(conversation_ids)
+    # Failures stay queued for the nightly run to retry
+    finish_jobs(analysed, skipped)
+    return {"status": "success", "requested": len(conversation_ids), "analysed": len(analysed)}
\ No newline at end of file
@@ -1,3 +1,998 @@
-from django.test import TestCase
+import collections
+import io
+import json
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .analyzer import (
+    analyze_conversations, calculate_empathy, calculate_overall_score, detect_escalation_need, perform_analysis
+)
+from .backends import BaseAnalyzerBackend, HTTPScoringBackend, get_backend
+from .batching import AnalysisBatcher
+from . import partitions
+from .metrics import bucket_for, summarize
+from .models import AnalysisJob, Conversation, ConversationAnalysis, Message, MetricSketch
+from .renderers import ORJSONParser, ORJSONRenderer
+from .search import fts5_phrase, search_conversations
+from .serializers import ConversationAnalysisSerializer
+from .sketches import HyperLogLog, QuantileSketch
+from .tasks import analyze_conversations_batch, run_daily_analysis
+from .work_queue import claim_jobs, enqueue, process_claimed
+
+
+def create_conversation(messages, title=''):
+    """Create a conversation from (sender, text) pairs."""
+    conversation = Conversation.objects.create(title=title)
+    Message.objects.bulk_create([
+        Message(conversation=conversation, sender=sender, text=text)
+        for sender, text in messages
+    ])
+    return conversation
+
+
+SUPPORT_CHAT = [
+    ('user', 'Can you help me with my order please'),
+    ('ai', 'I am sorry, that is beyond my capability right now.'),
+]
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_bulk_created_messages_are_indexed(self):
+        conversation = create_conversation(SUPPORT_CHAT)
+        self.assertEqual(list(search_conversations('beyond my capability')), [conversation])
+
+    def test_updated_and_deleted_messages_are_reindexed(self):
+        conversation = create_conversation(SUPPORT_CHAT)
+        Message.objects.filter(conversation=conversation, sender='ai').update(text='Your refund is on its way')
+
+        self.assertFalse(search_conversations('beyond my capability').exists())
+        self.assertEqual(list(search_conversations('refund is on its way')), [conversation])
+
+        Message.objects.filter(conversation=conversation).delete()
+        self.assertFalse(search_conversations('refund').exists())
+
+    def test_query_is_matched_as_a_phrase(self):
+        create_conversation(SUPPORT_CHAT)
+        self.assertFalse(search_conversations('capability beyond my').exists())
+
+    def test_quotes_and_operators_are_literal(self):
+        self.assertEqual(fts5_phrase('say "hi"'), '"say ""hi"""')
+        create_conversation([('user', 'cats AND dogs'), ('ai', 'NOT sure about "quoted" words')])
+
+        for query in ['"quoted"', 'cats AND dogs', 'NOT sure', 'dogs OR', 'cats*', 'NEAR(', '"']:
+            with self.subTest(query=query):
+                # Must not raise an FTS5 syntax error
+                list(search_conversations(query))
+        self.assertEqual(search_conversations('"quoted" words').count(), 1)
+        self.assertFalse(search_conversations('cats OR birds').exists())
+
+    def test_endpoint_returns_null_analysis_until_analysed(self):
+        conversation = create_conversation(SUPPORT_CHAT, title='Order help')
+
+        response = self.client.get('/api/search/', {'q': 'beyond my capability'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        result = response.json()['results'][0]
+        self.assertEqual(result['conversation_id'], conversation.id)
+        self.assertEqual(result['title'], 'Order help')
+        self.assertIsNone(result['analysis'])
+
+        analysis = perform_analysis(conversation.id)
+        result = self.client.get('/api/search/', {'q': 'beyond my capability'}).json()['results'][0]
+        self.assertEqual(result['analysis']['id'], analysis.id)
+        self.assertEqual(result['analysis']['conversation_id'], conversation.id)
+
+    def test_endpoint_requires_query(self):
+        for params in [{}, {'q': '   '}]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/search/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'q is required'})
+
+
+def exact_quantile(ordered, q):
+    """Value at the same rank QuantileSketch.quantile targets."""
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class QuantileSketchTests(TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        # Response-time-like values spanning several orders of magnitude
+        self.values = [rng.lognormvariate(2, 1.5) for _ in range(20000)]
+
+    def sketch_of(self, values):
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = self.sketch_of(self.values)
+        ordered = sorted(self.values)
+        for q in [0.0, 0.01, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1.0]:
+            with self.subTest(q=q):
+                expected = exact_quantile(ordered, q)
+                self.assertLessEqual(abs(sketch.quantile(q) - expected) / expected, 0.01)
+
+    def test_zero_values(self):
+        sketch = self.sketch_of([0.0, 0.0, 0.0, 2.0])
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertLessEqual(abs(sketch.quantile(1.0) - 2.0) / 2.0, 0.01)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+    def test_merge_is_associative_and_matches_single_sketch(self):
+        a, b, c = (self.sketch_of(self.values[i::3]) for i in range(3))
+
+        left = QuantileSketch.from_dict(a.to_dict())
+        left.merge(b)
+        left.merge(c)
+
+        bc = QuantileSketch.from_dict(b.to_dict())
+        bc.merge(c)
+        right = QuantileSketch.from_dict(a.to_dict())
+        right.merge(bc)
+
+        whole = self.sketch_of(self.values)
+        self.assertEqual(left.to_dict(), right.to_dict())
+        self.assertEqual(left.bins, whole.bins)
+        self.assertEqual((left.count, left.min, left.max), (whole.count, whole.min, whole.max))
+
+    def test_merge_rejects_different_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+    def test_dict_round_trip(self):
+        sketch = self.sketch_of(self.values[:1000] + [0.0])
+        restored = QuantileSketch.from_dict(sketch.to_dict())
+        self.assertEqual(restored.to_dict(), sketch.to_dict())
+        for q in [0.1, 0.5, 0.99]:
+            self.assertEqual(restored.quantile(q), sketch.quantile(q))
+        self.assertEqual(QuantileSketch.from_dict({}).count, 0)
+
+
+class HyperLogLogTests(TestCase):
+    # Standard error is 1.04 / sqrt(4096) ~= 1.6%; allow 3 standard errors
+    TOLERANCE = 3 * 1.04 / math.sqrt(4096)
+
+    def counter_of(self, values):
+        counter = HyperLogLog()
+        for value in values:
+            counter.add(value)
+        return counter
+
+    def test_error_bound(self):
+        for n in [10, 1000, 50000]:
+            with self.subTest(n=n):
+                counter = self.counter_of(range(n))
+                self.assertLessEqual(abs(counter.count() - n) / n, self.TOLERANCE)
+
+    def test_duplicates_do_not_count(self):
+        counter = self.counter_of(list(range(500)) * 4)
+        self.assertLessEqual(abs(counter.count() - 500) / 500, self.TOLERANCE)
+
+    def test_merge_counts_union(self):
+        a = self.counter_of(range(0, 30000))
+        b = self.counter_of(range(20000, 50000))
+        a.merge(b)
+        self.assertLessEqual(abs(a.count() - 50000) / 50000, self.TOLERANCE)
+        self.assertEqual(a.registers, self.counter_of(range(50000)).registers)
+
+    def test_string_round_trip(self):
+        counter = self.counter_of(range(100))
+        restored = HyperLogLog.from_string(counter.to_string())
+        self.assertEqual(restored.registers, counter.registers)
+        self.assertEqual(restored.precision, 12)
+        self.assertEqual(HyperLogLog.from_string('').count(), 0)
+
+
+RESOLVED_CHAT = [
+    ('user', 'Can you help me track my order'),
+    ('ai', 'Sure, your order has been shipped and arrives tomorrow.'),
+    ('user', 'Thanks, that is great'),
+    ('ai', 'You are welcome, enjoy your order.'),
+]
+
+
+class MetricSketchTests(TestCase):
+    def test_reanalysis_does_not_count_twice(self):
+        conversation = create_conversation(RESOLVED_CHAT)
+        for _ in range(3):
+            perform_analysis(conversation.id)
+        analyze_conversations([conversation.id])
+
+        now = timezone.now()
+        summary = summarize('overall_score', now - timedelta(hours=1), now + timedelta(hours=1))
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual(summary['distinct_conversations'], 1)
+        self.assertTrue(ConversationAnalysis.objects.get(conversation=conversation).sketched)
+
+    def test_batch_records_each_new_conversation_once(self):
+        conversations = [create_conversation(RESOLVED_CHAT) for _ in range(3)]
+        perform_analysis(conversations[0].id)
+        analyze_conversations([c.id for c in conversations])
+
+        now = timezone.now()
+        summary = summarize('overall_score', now - timedelta(hours=1), now + timedelta(hours=1))
+        self.assertEqual(summary['count'], 3)
+        # Two user -> AI gaps per conversation
+        summary = summarize('response_time', now - timedelta(hours=1), now + timedelta(hours=1))
+        self.assertEqual(summary['count'], 6)
+        self.assertEqual(MetricSketch.objects.filter(metric='overall_score').count(), 1)
+
+    def test_samples_are_filed_under_conversation_time(self):
+        conversation = create_conversation(RESOLVED_CHAT)
+        created_at = timezone.now() - timedelta(days=3)
+        Conversation.objects.filter(id=conversation.id).update(created_at=created_at)
+        Message.objects.filter(conversation=conversation).update(created_at=created_at)
+        analyze_conversations([conversation.id])
+
+        self.assertEqual(summarize('overall_score', created_at, created_at + timedelta(hours=1))['count'], 1)
+        now = timezone.now()
+        self.assertEqual(summarize('overall_score', now - timedelta(days=1), now)['count'], 0)
+        self.assertEqual(set(MetricSketch.objects.values_list('bucket_start', flat=True)), {bucket_for(created_at)})
+
+
+class PercentilesViewTests(TestCase):
+    URL = '/api/reports/percentiles/'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_summary_for_recorded_analyses(self):
+        perform_analysis(create_conversation(RESOLVED_CHAT).id)
+        response = self.client.get(self.URL, {'metric': 'overall_score', 'q': '0.5,0.999'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(set(data['percentiles']), {'p50', 'p99.9'})
+        self.assertEqual(data['relative_error'], 0.01)
+
+    def test_empty_range(self):
+        response = self.client.get(self.URL, {'end': '2020-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+        self.assertEqual(response.json()['percentiles'], {'p50': None, 'p95': None, 'p99': None})
+
+    def test_invalid_parameters(self):
+        cases = [
+            {'metric': 'title'},
+            {'start': 'yesterday'},
+            {'end': 'not-a-date'},
+            {'start': '2025-01-02T00:00:00Z', 'end': '2025-01-01T00:00:00Z'},
+            {'q': '1.5'},
+            {'q': '-0.1'},
+            {'q': 'median'},
+            {'q': ''},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                response = self.client.get(self.URL, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ORJSONRendererTests(TestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_float_exponents_match_json_dumps(self):
+        for value in [
+            6.4e-05, 0.00001, 1.2345678901234567e-05, 9.9e-07, 1e-7, 1e-10, 0.0001, 10.00001, 123.456,
+            1e15, 1e16, 1.5e16, 1e300, -2.5e-05, -1e-6, 5e-324, 0.0, -0.0,
+        ]:
+            with self.subTest(value=value):
+                self.assertSameBytes({'value': value, 'values': [value, 1.0]})
+                self.assertSameBytes(value)
+
+    def test_float_lookalikes_inside_strings_are_kept(self):
+        for text in ['0.00001', 'e-5', 'a:0.00001,b', 'say "e-7"', 'back\\slash e-3', 'both \\" 0.00002 "']:
+            with self.subTest(text=text):
+                self.assertSameBytes({'text': text, text: 4.3e-05, 'values': [text, 1e-7]})
+
+    def test_float_keys_match_json_dumps(self):
+        self.assertSameBytes({1e-05: 'a', 1e-7: 'b', 0.5: 'c'})
+
+    def test_line_separators_are_escaped(self):
+        data = {'text': 'line\u2028break\u2029para', 'emoji': '\U0001f600', 'quote': '"\\'}
+        self.assertSameBytes(data)
+        self.assertIn(b'\\u2028', ORJSONRenderer().render(data))
+
+    def test_non_string_keys_and_empty_payloads(self):
+        for data in [{1: 'a', 2: None}, [], {}, '', None]:
+            with self.subTest(data=data):
+                self.assertSameBytes(data)
+
+
+class AnalysisReportRenderingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for response_time_avg, response_time_max, sentiment in [
+            (6.4e-05, 1e16, 'mixed\u2028'),
+            (12.5, 30.0, 'positive'),
+        ]:
+            ConversationAnalysis.objects.create(
+                conversation=create_conversation(SUPPORT_CHAT),
+                response_time_avg=response_time_avg,
+                response_time_max=response_time_max,
+                sentiment=sentiment,
+                overall_score=3.25,
+            )
+
+    def serializer_bytes(self, data):
+        return JSONRenderer().render(data)
+
+    def test_list_matches_serializer_output(self):
+        queryset = ConversationAnalysis.objects.all().order_by('-created_at')
+        expected = self.serializer_bytes(ConversationAnalysisSerializer(queryset, many=True).data)
+
+        response = self.client.get('/api/reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected)
+        self.assertIn(b'6.4e-05', response.content)
+        self.assertIn(b'1e+16', response.content)
+        self.assertIn(b'\\u2028', response.content)
+
+    def test_detail_matches_serializer_output(self):
+        for analysis in ConversationAnalysis.objects.all():
+            with self.subTest(pk=analysis.pk):
+                response = self.client.get(f'/api/reports/{analysis.pk}/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, self.serializer_bytes(ConversationAnalysisSerializer(analysis).data))
+
+    def test_detail_not_found(self):
+        response = self.client.get('/api/reports/999999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Not found.'})
+
+
+class AnalysisReportFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        self.created = {}
+        for days_ago in [40, 10, 1]:
+            analysis = ConversationAnalysis.objects.create(conversation=create_conversation(SUPPORT_CHAT))
+            ConversationAnalysis.objects.filter(pk=analysis.pk).update(created_at=now - timedelta(days=days_ago))
+            self.created[days_ago] = analysis.pk
+        self.now = now
+
+    def report_ids(self, **params):
+        response = self.client.get('/api/reports/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_since_and_until_bound_created_at(self):
+        since = (self.now - timedelta(days=20)).isoformat()
+        until = (self.now - timedelta(days=5)).isoformat()
+        self.assertEqual(self.report_ids(since=since), [self.created[1], self.created[10]])
+        self.assertEqual(self.report_ids(until=until), [self.created[10], self.created[40]])
+        self.assertEqual(self.report_ids(since=since, until=until), [self.created[10]])
+        self.assertEqual(self.report_ids(), [self.created[1], self.created[10], self.created[40]])
+
+    def test_until_is_exclusive(self):
+        ConversationAnalysis.objects.filter(pk=self.created[1]).update(created_at=self.now)
+        self.assertNotIn(self.created[1], self.report_ids(until=self.now.isoformat()))
+        self.assertIn(self.created[1], self.report_ids(since=self.now.isoformat()))
+
+    def test_invalid_datetimes_are_rejected(self):
+        for params in [{'since': 'yesterday'}, {'until': '2024-13-01T00:00:00'}]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/reports/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'since and until must be ISO 8601 datetimes'})
+
+
+class ORJSONParserTests(TestCase):
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {})
+
+    def test_valid_bodies_match_json_parser(self):
+        bodies = [
+            b'{"a": [1, 2.5, null, true]}', b'"\\u2028"', b'[]',
+            # Beyond 64 bits orjson would return floats
+            b'{"big": 123456789012345678901234567890}', b'-9223372036854775809', b'0.12345678901234567890123',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(self.parse(ORJSONParser(), body), self.parse(JSONParser(), body))
+
+    def test_invalid_bodies_raise_same_errors(self):
+        for body in [b'', b'{', b'[1,]', b"{'a': 1}", b'NaN', b'{"a": Infinity}', b'\xff\xfe']:
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    self.parse(JSONParser(), body)
+                with self.assertRaises(ParseError) as actual:
+                    self.parse(ORJSONParser(), body)
+                self.assertEqual(str(actual.exception.detail), str(expected.exception.detail))
+
+    def test_upload_reports_parse_error(self):
+        response = self.client.post('/api/conversations/', data=b'{"title": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error - '))
+
+
+class WorkQueueTests(TestCase):
+    def enqueue_conversations(self, *chats):
+        conversations = [create_conversation(chat) for chat in chats]
+        enqueue([conversation.id for conversation in conversations])
+        return [conversation.id for conversation in conversations]
+
+    def seconds_until_available(self, conversation_id):
+        return (AnalysisJob.objects.get(conversation_id=conversation_id).available_at - timezone.now()).total_seconds()
+
+    def test_upload_enqueues_conversation_once(self):
+        response = APIClient().post('/api/conversations/', {
+            'title': 'Order help',
+            'messages': [{'sender': sender, 'message': text} for sender, text in SUPPORT_CHAT],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        enqueue([response.json()['id']])
+        job = AnalysisJob.objects.get()
+        self.assertEqual(job.conversation_id, response.json()['id'])
+        self.assertEqual(job.status, AnalysisJob.PENDING)
+        self.assertEqual(claim_jobs(10), [job.conversation_id])
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_claims_oldest_available_first(self):
+        first, second, third = self.enqueue_conversations(RESOLVED_CHAT, RESOLVED_CHAT, RESOLVED_CHAT)
+        AnalysisJob.objects.filter(conversation_id=first).update(available_at=timezone.now() - timedelta(hours=1))
+        AnalysisJob.objects.filter(conversation_id=third).update(available_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(claim_jobs(1), [first])
+        self.assertEqual(claim_jobs(10), [second])
+        job = AnalysisJob.objects.get(conversation_id=second)
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.RUNNING, 1))
+        self.assertEqual(len(job.claimed_by), 32)
+
+    def test_analysed_jobs_leave_the_queue(self):
+        conversation_ids = self.enqueue_conversations(RESOLVED_CHAT, SUPPORT_CHAT)
+        self.assertEqual(sorted(process_claimed(claim_jobs(10))), sorted(conversation_ids))
+        self.assertFalse(AnalysisJob.objects.exists())
+        self.assertEqual(ConversationAnalysis.objects.count(), 2)
+
+    def test_unanalyzable_is_terminal(self):
+        conversation_id, = self.enqueue_conversations([('user', 'Hello? Anyone there?')])
+        self.assertEqual(process_claimed(claim_jobs(10)), [])
+
+        job = AnalysisJob.objects.get(conversation_id=conversation_id)
+        self.assertEqual((job.status, job.claimed_by, job.claimed_at), (AnalysisJob.UNANALYZABLE, '', None))
+        AnalysisJob.objects.update(claimed_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(claim_jobs(10), [])
+
+    @override_settings(ANALYSIS_QUEUE_BACKOFF_SECONDS=60, ANALYSIS_QUEUE_MAX_ATTEMPTS=3)
+    def test_failures_back_off_then_give_up(self):
+        conversation_id, = self.enqueue_conversations(RESOLVED_CHAT)
+
+        with mock.patch('analysis.work_queue.analyze_conversations', side_effect=RuntimeError('model down')):
+            for attempt, backoff in [(1, 60), (2, 120)]:
+                self.assertEqual(process_claimed(claim_jobs(10)), [])
+                job = AnalysisJob.objects.get(conversation_id=conversation_id)
+                self.assertEqual((job.status, job.attempts, job.last_error), (AnalysisJob.PENDING, attempt, 'model down'))
+                self.assertAlmostEqual(self.seconds_until_available(conversation_id), backoff, delta=5)
+                # Not claimable until the backoff has passed
+                self.assertEqual(claim_jobs(10), [])
+                AnalysisJob.objects.update(available_at=timezone.now())
+
+            self.assertEqual(process_claimed(claim_jobs(10)), [])
+
+        job = AnalysisJob.objects.get(conversation_id=conversation_id)
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.FAILED, 3))
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_conversations_missing_from_the_batch_result_are_retried(self):
+        good, bad = self.enqueue_conversations(RESOLVED_CHAT, RESOLVED_CHAT)
+        with mock.patch('analysis.work_queue.analyze_conversations', return_value=([good], [])):
+            self.assertEqual(process_claimed(claim_jobs(10)), [good])
+
+        job = AnalysisJob.objects.get()
+        self.assertEqual((job.conversation_id, job.status), (bad, AnalysisJob.PENDING))
+        self.assertEqual(job.last_error, 'Analysis raised an error')
+
+    @override_settings(ANALYSIS_QUEUE_LEASE_SECONDS=900)
+    def test_expired_lease_is_reclaimed(self):
+        conversation_id, = self.enqueue_conversations(RESOLVED_CHAT)
+        self.assertEqual(claim_jobs(10), [conversation_id])
+        first_token = AnalysisJob.objects.get().claimed_by
+
+        AnalysisJob.objects.update(claimed_at=timezone.now() - timedelta(seconds=899))
+        self.assertEqual(claim_jobs(10), [])
+
+        AnalysisJob.objects.update(claimed_at=timezone.now() - timedelta(seconds=901))
+        self.assertEqual(claim_jobs(10), [conversation_id])
+        job = AnalysisJob.objects.get()
+        self.assertEqual(job.attempts, 2)
+        self.assertNotEqual(job.claimed_by, first_token)
+
+    @override_settings(ANALYSIS_BATCH_SIZE=2)
+    def test_run_daily_analysis_drains_the_queue(self):
+        conversation_ids = self.enqueue_conversations(RESOLVED_CHAT, SUPPORT_CHAT, RESOLVED_CHAT)
+        empty_id, = self.enqueue_conversations([('ai', 'Hello!')])
+
+        with mock.patch('analysis.work_queue.analyze_conversations', wraps=analyze_conversations) as analyze:
+            self.assertEqual(run_daily_analysis(), 'Successfully analyzed 3 conversations')
+        self.assertEqual([len(call.args[0]) for call in analyze.call_args_list], [2, 2])
+
+        self.assertEqual(
+            sorted(ConversationAnalysis.objects.values_list('conversation_id', flat=True)), sorted(conversation_ids)
+        )
+        self.assertEqual(list(AnalysisJob.objects.values_list('conversation_id', 'status')),
+                         [(empty_id, AnalysisJob.UNANALYZABLE)])
+
+
+class AnalysisBatcherTests(TestCase):
+    def test_flushes_when_full(self):
+        batches = []
+        batcher = AnalysisBatcher(batches.append, max_size=3, max_wait_ms=60000)
+        batcher.add(1)
+        batcher.add(2)
+        self.assertEqual(batches, [])
+
+        batcher.add(3)
+        self.assertEqual(batches, [[1, 2, 3]])
+        self.assertIsNone(batcher.timer)
+        self.assertEqual(batcher.pending, [])
+
+    def test_flushes_after_max_wait(self):
+        batches = []
+        sent = threading.Event()
+        batcher = AnalysisBatcher(lambda batch: (batches.append(batch), sent.set()), max_size=100, max_wait_ms=50)
+
+        started = time.monotonic()
+        batcher.add(1)
+        batcher.add(2)
+        self.assertTrue(sent.wait(2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(batches, [[1, 2]])
+        self.assertIsNone(batcher.timer)
+
+    def test_dispatch_errors_do_not_reach_the_caller(self):
+        batcher = AnalysisBatcher(mock.Mock(side_effect=ConnectionError('broker down')), max_size=1)
+        batcher.add(1)
+        self.assertEqual(batcher.pending, [])
+
+
+class AutoAnalyzeTests(TestCase):
+    PAYLOAD = {
+        'title': 'Order help',
+        'messages': [{'sender': sender, 'message': text} for sender, text in SUPPORT_CHAT],
+    }
+
+    def upload(self):
+        response = APIClient().post('/api/conversations/', self.PAYLOAD, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    @override_settings(ANALYSIS_AUTO_ANALYZE=True)
+    def test_upload_schedules_after_commit(self):
+        with mock.patch('analysis.views.schedule_analysis') as schedule:
+            with self.captureOnCommitCallbacks() as callbacks:
+                conversation_id = self.upload()
+            schedule.assert_not_called()
+
+            for callback in callbacks:
+                callback()
+        schedule.assert_called_once_with(conversation_id)
+
+    @override_settings(ANALYSIS_AUTO_ANALYZE=False)
+    def test_upload_does_not_schedule_when_disabled(self):
+        with mock.patch('analysis.views.schedule_analysis') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.upload()
+        schedule.assert_not_called()
+
+    def queue_conversations(self, count):
+        conversation_ids = [create_conversation(RESOLVED_CHAT).id for _ in range(count)]
+        enqueue(conversation_ids)
+        return conversation_ids
+
+    def test_batch_task_query_count_does_not_grow_with_batch_size(self):
+        small_batch = self.queue_conversations(2)
+        with CaptureQueriesContext(connection) as small:
+            analyze_conversations_batch(small_batch)
+        # Start the next batch from empty sketch rows too
+        MetricSketch.objects.all().delete()
+
+        large_batch = self.queue_conversations(20)
+        with self.assertNumQueries(len(small.captured_queries)) as large:
+            result = analyze_conversations_batch(large_batch)
+        self.assertEqual(result['analysed'], 20)
+        self.assertEqual(ConversationAnalysis.objects.count(), 22)
+        self.assertFalse(AnalysisJob.objects.exists())
+
+        sql = [query['sql'] for query in large.captured_queries]
+        self.assertEqual(len([q for q in sql if q.startswith('SELECT') and 'FROM "analysis_message"' in q]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "analysis_conversationanalysis"')]), 1)
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    WORKERS = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.use_file_database()
+
+    def use_file_database(self):
+        """
+        Point this test at a file copy of the test database. Threads share an in-memory SQLite
+        database through one cache whose table locks fail concurrent writers immediately,
+        unlike the file-backed database used in production.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'queue.sqlite3')
+
+        connection.ensure_connection()
+        copy = sqlite3.connect(path)
+        connection.connection.backup(copy)
+        copy.close()
+
+        original_settings, original_connection = connections.settings['default'], connections['default']
+        connections.settings['default'] = {**original_settings, 'NAME': path}
+        connections['default'] = connections.create_connection('default')
+
+        def restore():
+            connections['default'].close()
+            connections.settings['default'] = original_settings
+            connections['default'] = original_connection
+        self.addCleanup(restore)
+
+    def test_concurrent_claimers_share_out_every_job_once(self):
+        conversations = Conversation.objects.bulk_create([Conversation(title=str(i)) for i in range(300)])
+        enqueue([conversation.id for conversation in conversations])
+
+        claimed = collections.Counter()
+        errors = []
+        start = threading.Barrier(self.WORKERS)
+
+        def worker():
+            try:
+                start.wait()
+                while True:
+                    conversation_ids = claim_jobs(7)
+                    if not conversation_ids:
+                        break
+                    claimed.update(conversation_ids)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(set(claimed), {conversation.id for conversation in conversations})
+        self.assertEqual(max(claimed.values()), 1)
+        self.assertFalse(AnalysisJob.objects.exclude(status=AnalysisJob.RUNNING).exists())
+        self.assertFalse(AnalysisJob.objects.exclude(attempts=1).exists())
+
+
+class StubScoringHandler(BaseHTTPRequestHandler):
+    """
+    Scoring service stand-in: answers every conversation with the server's `scores` and
+    `status` after `delay` seconds, recording request headers and client connections.
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+
+    def do_POST(self):
+        server = self.server
+        conversations = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['conversations']
+        with server.lock:
+            server.batch_sizes.append(len(conversations))
+            server.headers.append(self.headers)
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            body = json.dumps({'results': [
+                {'id': conversation['id'], 'scores': server.scores} for conversation in conversations
+            ]}).encode()
+            self.send_response(server.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # client gave up at its deadline
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPScoringBackendTests(TestCase):
+    SCORES = {'sentiment': 'negative', 'clarity_score': 1.0, 'relevance_score': 1.0,
+              'accuracy_score': 1.0, 'completeness_score': 1.0}
+
+    def setUp(self):
+        cache.clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubScoringHandler)
+        self.server.daemon_threads = True
+        self.server.block_on_close = False
+        self.server.lock = threading.Lock()
+        self.server.batch_sizes = []
+        self.server.headers = []
+        self.server.connections = set()
+        self.server.in_flight = 0
+        self.server.peak_in_flight = 0
+        self.server.delay = 0
+        self.server.status = 200
+        self.server.scores = self.SCORES
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/score'
+
+    def backend(self, **options):
+        return HTTPScoringBackend(url=self.url, **options)
+
+    def conversations(self, count, first=0):
+        # Distinct content per conversation, so each has its own cache key
+        created = [create_conversation(SUPPORT_CHAT + [('user', f'order {i}')]) for i in range(first, first + count)]
+        return {conversation.id: list(conversation.messages.order_by('created_at')) for conversation in created}
+
+    def test_batches_into_chunks(self):
+        results = self.backend(batch_size=2).score_batch(self.conversations(5))
+        self.assertEqual(sorted(self.server.batch_sizes), [1, 2, 2])
+        self.assertEqual(len(results), 5)
+        self.assertEqual(next(iter(results.values())), self.SCORES)
+
+    def test_concurrency_is_bounded(self):
+        self.server.delay = 0.1
+        self.backend(batch_size=1, max_concurrency=2).score_batch(self.conversations(6))
+        self.assertEqual(len(self.server.batch_sizes), 6)
+        self.assertLessEqual(self.server.peak_in_flight, 2)
+
+    def test_connections_are_reused(self):
+        self.backend(batch_size=1, max_concurrency=2).score_batch(self.conversations(6))
+        self.assertEqual(len(self.server.batch_sizes), 6)
+        self.assertLessEqual(len(self.server.connections), 2)
+
+    def test_headers_are_sent(self):
+        self.backend(headers={'Authorization': 'Bearer secret'}).score_batch(self.conversations(1))
+        self.assertEqual(self.server.headers[0]['Authorization'], 'Bearer secret')
+
+    def test_request_deadline_falls_back_to_heuristics(self):
+        self.server.delay = 2
+        conversations = self.conversations(3)
+
+        started = time.monotonic()
+        self.assertEqual(self.backend(batch_size=1, timeout=0.2).score_batch(conversations), {})
+        self.assertLess(time.monotonic() - started, 1)
+
+        with mock.patch('analysis.analyzer.get_backend', return_value=self.backend(timeout=0.2)):
+            analysed, skipped = analyze_conversations(list(conversations))
+        self.assertEqual(len(analysed), 3)
+        analysis = ConversationAnalysis.objects.get(conversation_id=analysed[0])
+        self.assertEqual(analysis.sentiment, 'neutral')
+        self.assertEqual(analysis.clarity_score, 5.0)
+
+    def test_request_deadline_excludes_time_queued(self):
+        # 10 rounds of 0.1s requests: the batch takes ~1s, each request well under its 0.5s
+        self.server.delay = 0.1
+        results = self.backend(batch_size=1, max_concurrency=2, timeout=0.5).score_batch(self.conversations(20))
+        self.assertEqual(len(results), 20)
+
+    def test_batch_deadline_cuts_off_queued_requests(self):
+        # One request at a time: the first answers at ~0.3s, the second would at ~0.6s
+        self.server.delay = 0.3
+        started = time.monotonic()
+        results = self.backend(batch_size=1, max_concurrency=1, batch_timeout=0.5).score_batch(self.conversations(5))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(results), 1)
+
+    def test_error_status_falls_back(self):
+        self.server.status = 503
+        self.assertEqual(self.backend().score_batch(self.conversations(2)), {})
+
+    def test_oversized_response_falls_back(self):
+        self.assertEqual(self.backend(max_response_bytes=64).score_batch(self.conversations(2)), {})
+        self.assertEqual(len(self.backend().score_batch(self.conversations(2, first=2))), 2)
+
+    def test_unreachable_service_falls_back(self):
+        backend = HTTPScoringBackend(url='http://127.0.0.1:1/score')
+        self.assertEqual(backend.score_batch(self.conversations(1)), {})
+
+    def test_cached_results_skip_the_service(self):
+        conversations = self.conversations(3)
+        first = self.backend().score_batch(conversations)
+        self.assertEqual(len(self.server.batch_sizes), 1)
+
+        self.server.scores = {'clarity_score': 2.0}
+        self.assertEqual(self.backend().score_batch(conversations), first)
+        self.assertEqual(len(self.server.batch_sizes), 1)
+
+        # Only the new conversation goes to the service
+        conversations.update(self.conversations(1, first=3))
+        self.backend().score_batch(conversations)
+        self.assertEqual(self.server.batch_sizes, [3, 1])
+
+    def test_refine_scores_recomputes_derived_fields(self):
+        conversation = create_conversation(SUPPORT_CHAT)
+        with mock.patch('analysis.analyzer.get_backend', return_value=self.backend()):
+            analysis = perform_analysis(conversation.id)
+
+        ai_messages = list(conversation.messages.filter(sender='ai'))
+        user_messages = list(conversation.messages.filter(sender='user'))
+        self.assertEqual(analysis.sentiment, 'negative')
+        self.assertEqual(analysis.clarity_score, 1.0)
+        self.assertEqual(analysis.empathy_score, calculate_empathy(ai_messages, 'negative'))
+        self.assertEqual(analysis.overall_score, calculate_overall_score(1.0, 1.0, 1.0, 1.0, analysis.empathy_score))
+        # Negative and unresolved now escalates; the heuristics alone said neutral, no escalation
+        self.assertTrue(analysis.escalation_need)
+        self.assertEqual(
+            analysis.escalation_need,
+            detect_escalation_need(user_messages, ai_messages, 'negative', analysis.resolution_rate)
+        )
+
+
+class BackendConfigTests(TestCase):
+    def setUp(self):
+        # get_backend() caches the configured backend at module level
+        patcher = mock.patch('analysis.backends._backend', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_settings_options_map_to_lowercase_arguments(self):
+        config = {
+            'BACKEND': 'analysis.backends.HTTPScoringBackend',
+            'OPTIONS': {'URL': 'http://scoring.local/score', 'BATCH_SIZE': 8, 'MAX_CONCURRENCY': 2,
+                        'TIMEOUT': 1.5, 'BATCH_TIMEOUT': 10, 'CACHE_TIMEOUT': 60,
+                        'HEADERS': {'Authorization': 'Bearer secret'}},
+        }
+        with self.settings(ANALYSIS_BACKEND=config):
+            backend = get_backend()
+        self.assertIsInstance(backend, HTTPScoringBackend)
+        self.assertEqual(
+            (backend.url, backend.batch_size, backend.max_concurrency, backend.timeout, backend.batch_timeout,
+             backend.cache_timeout, backend.headers),
+            ('http://scoring.local/score', 8, 2, 1.5, 10, 60, {'Authorization': 'Bearer secret'})
+        )
+
+    def test_base_backend_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseAnalyzerBackend()
+
+
+postgresql_only = unittest.skipUnless(connection.vendor == 'postgresql', "messages are only partitioned on PostgreSQL")
+
+
+class MessagePartitionTests(TestCase):
+    def backdated_conversation(self):
+        conversation = create_conversation(RESOLVED_CHAT)
+        Message.objects.filter(conversation=conversation).update(
+            created_at=conversation.created_at - timedelta(days=40)
+        )
+        return conversation
+
+    def test_backdated_messages_are_analysed_without_partitions(self):
+        conversation = self.backdated_conversation()
+        with mock.patch('analysis.partitions.supports_partitioning', return_value=False):
+            self.assertEqual(analyze_conversations([conversation.id]), ([conversation.id], []))
+            self.assertIsNotNone(perform_analysis(conversation.id))
+
+    def test_partitioned_message_queries_are_bounded(self):
+        conversation = create_conversation(RESOLVED_CHAT)
+        with mock.patch('analysis.partitions.supports_partitioning', return_value=True):
+            with CaptureQueriesContext(connection) as queries:
+                analyze_conversations([conversation.id])
+                perform_analysis(conversation.id)
+        message_queries = [q['sql'] for q in queries.captured_queries if 'FROM "analysis_message"' in q['sql']]
+        self.assertEqual(len(message_queries), 2)
+        for sql in message_queries:
+            self.assertIn('"analysis_message"."created_at" >=', sql)
+
+    @postgresql_only
+    def test_rebuilt_table_keeps_django_names(self):
+        table, column = Message._meta.db_table, Message._meta.get_field('conversation').column
+        with connection.schema_editor() as editor:
+            # The names Django generates when it creates the FK and its index itself
+            foreign_key = editor._create_index_name(table, [column], suffix='_fk_analysis_conversation_id')
+            foreign_key_index = editor._create_index_name(table, [column])
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+
+        self.assertEqual([name for name, info in constraints.items() if info['foreign_key']], [foreign_key])
+        self.assertLessEqual(
+            {foreign_key_index, 'message_conversation_created', 'message_created_at', 'analysis_message_text_fts'},
+            set(constraints)
+        )
+
+
+class ManagePartitionsTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.recent = create_conversation(RESOLVED_CHAT)
+        self.expired = create_conversation(RESOLVED_CHAT)
+        Conversation.objects.filter(pk=self.expired.pk).update(created_at=now - timedelta(days=500))
+        Message.objects.filter(conversation=self.expired).update(created_at=now - timedelta(days=500))
+
+    def manage_partitions(self, **options):
+        out = io.StringIO()
+        call_command('manage_partitions', stdout=out, **options)
+        return out.getvalue()
+
+    def test_retention_deletes_expired_messages_in_batches(self):
+        expired_messages = Message.objects.filter(conversation=self.expired).count()
+        with mock.patch('analysis.partitions.supports_partitioning', return_value=False):
+            with CaptureQueriesContext(connection) as queries:
+                output = self.manage_partitions(retain_months=12, batch_size=2)
+
+        self.assertIn(f"Deleted {expired_messages} messages", output)
+        self.assertIn("Deleted 1 conversations", output)
+        self.assertFalse(Conversation.objects.filter(pk=self.expired.pk).exists())
+        self.assertFalse(Message.objects.filter(conversation_id=self.expired.pk).exists())
+        self.assertEqual(Message.objects.filter(conversation=self.recent).count(), len(RESOLVED_CHAT))
+        batches = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('DELETE FROM "analysis_message" WHERE "analysis_message"."id" IN')
+        ]
+        self.assertEqual(len(batches), math.ceil(expired_messages / 2))
+
+    def test_dry_run_deletes_nothing(self):
+        with mock.patch('analysis.partitions.supports_partitioning', return_value=False):
+            output = self.manage_partitions(retain_months=12, dry_run=True)
+        self.assertIn(f"Would delete {len(RESOLVED_CHAT)} messages", output)
+        self.assertIn("Would delete 1 conversations", output)
+        self.assertEqual(Message.objects.count(), 2 * len(RESOLVED_CHAT))
+
+    def test_retain_months_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            self.manage_partitions(retain_months=0)
+
+    @postgresql_only
+    def test_upcoming_month_is_split_out_of_the_default_partition(self):
+        month = partitions.add_months(partitions.month_start(timezone.now()), 6)
+        message = Message.objects.filter(conversation=self.recent).first()
+        Message.objects.filter(pk=message.pk).update(created_at=month + timedelta(days=2))
+
+        output = self.manage_partitions(months_ahead=6)
+
+        name = partitions.partition_name(month)
+        self.assertIn(f"Created {name} from 1 messages in {partitions.DEFAULT_PARTITION}", output)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM analysis_message WHERE id = %s", [message.pk])
+            self.assertEqual(cursor.fetchone()[0], name)
+            self.assertEqual(partitions.month_rows_in_default(cursor, month), 0)
+
+    @postgresql_only
+    def test_retention_empties_expired_months_of_the_default_partition(self):
+        # Both conversations' messages are now older than every partition, so they sit in the default partition
+        Message.objects.filter(conversation=self.recent).update(created_at=timezone.now() - timedelta(days=900))
+
+        output = self.manage_partitions(retain_months=12, batch_size=3)
+
+        self.assertIn(f"Deleted {2 * len(RESOLVED_CHAT)} messages from {partitions.DEFAULT_PARTITION}", output)
+        self.assertFalse(Message.objects.filter(conversation=self.recent).exists())
+        self.assertTrue(Conversation.objects.filter(pk=self.recent.pk).exists())
@@ -6,5 +6,7 @@ urlpatterns = [
     path('conversations/', views.ConversationUploadView.as_view(), name='conversation-upload'),
     path('analyse/', views.AnalysisTriggerView.as_view(), name='analysis-trigger'),
     path('reports/<int:pk>/', views.SingleAnalysisView.as_view(), name='single-report'),
+    path('reports/percentiles/', views.PercentilesView.as_view(), name='analysis-percentiles'),
     path('reports/', views.AnalysisReportView.as_view(), name='analysis-reports'),
+    path('search/', views.ConversationSearchView.as_view(), name='conversation-search'),
 ]
\ No newline at end of file
@@ -1,27 +1,150 @@
 # analysis/views.py
 from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db import transaction
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .models import Conversation, ConversationAnalysis
-from .serializers import ConversationSerializer, ConversationAnalysisSerializer
+from .serializers import (
+    ConversationSerializer, ConversationAnalysisSerializer, SearchResultSerializer, analysis_report_rows
+)
 from .analyzer import perform_analysis # Import your logic
+from .search import search_conversations
+from .metrics import METRICS, summarize
 from .tasks import analyze_conversation_async
+from .batching import schedule_analysis
+from .work_queue import enqueue
+
+def parse_time_param(value):
+    """Query param -> aware datetime; None when absent, False when unparseable."""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return False
+    if parsed is None:
+        return False
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 class ConversationUploadView(generics.CreateAPIView):
     """Upload chat JSON and create Conversation with nested Messages."""
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
 
+    def perform_create(self, serializer):
+        # The conversation, its messages and its queue entry are committed together
+        with transaction.atomic():
+            conversation = serializer.save()
+            # Queue for analysis; the nightly job claims from this table instead of scanning conversations
+            enqueue([conversation.id])
+            if getattr(settings, 'ANALYSIS_AUTO_ANALYZE', False):
+                # Only hand the id to the batcher once the messages are committed
+                transaction.on_commit(lambda: schedule_analysis(conversation.id))
+
 class AnalysisReportView(generics.ListAPIView):
     """List all conversation analysis results."""
     queryset = ConversationAnalysis.objects.all().order_by('-created_at')
     serializer_class = ConversationAnalysisSerializer
 
+    def get_queryset(self):
+        # Optional ?since=&until= (ISO 8601) bounds on created_at, served by its index
+        queryset = super().get_queryset()
+        since = parse_time_param(self.request.query_params.get('since'))
+        until = parse_time_param(self.request.query_params.get('until'))
+        if since is False or until is False:
+            raise ValidationError({"error": "since and until must be ISO 8601 datetimes"})
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        if until:
+            queryset = queryset.filter(created_at__lt=until)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        # Same payload as the serializer, without per-field serializer overhead
+        return Response(analysis_report_rows(self.filter_queryset(self.get_queryset())))
+
 class SingleAnalysisView(generics.RetrieveAPIView):
     """Fetch a single analysis report by ID."""
     queryset = ConversationAnalysis.objects.all()
     serializer_class = ConversationAnalysisSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        rows = analysis_report_rows(self.filter_queryset(self.get_queryset()).filter(pk=kwargs['pk']))
+        if not rows:
+            raise NotFound()
+        return Response(rows[0])
+
+class PercentilesView(APIView):
+    """
+    Fleet-wide distribution of a metric over a time range, merged from stored sketches.
+    GET /api/reports/percentiles/?metric=response_time&start=<iso>&end=<iso>&q=0.5,0.95,0.99
+    """
+    def get(self, request, *args, **kwargs):
+        metric = request.query_params.get('metric', 'response_time')
+        if metric not in METRICS:
+            return Response(
+                {"error": f"metric must be one of: {', '.join(METRICS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        end = parse_time_param(request.query_params.get('end'))
+        start = parse_time_param(request.query_params.get('start'))
+        if end is None:
+            end = timezone.now()
+        if start is None and end is not False:
+            start = end - timedelta(days=1)
+        if start is False or end is False or start >= end:
+            return Response(
+                {"error": "start and end must be ISO 8601 datetimes with start before end"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            quantiles = [float(q) for q in request.query_params.get('q', '0.5,0.95,0.99').split(',')]
+        except ValueError:
+            quantiles = None
+        if not quantiles or any(not 0 <= q <= 1 for q in quantiles):
+            return Response(
+                {"error": "q must be a comma-separated list of quantiles between 0 and 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        summary = summarize(metric, start, end, quantiles)
+        summary['start'] = start
+        summary['end'] = end
+        return Response(summary)
+
+class SearchPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+class ConversationSearchView(generics.ListAPIView):
+    """Full-text phrase search over message text: GET /api/search/?q=<phrase>"""
+    serializer_class = SearchResultSerializer
+    pagination_class = SearchPagination
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('q', '').strip():
+            return Response(
+                {"error": "q is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return search_conversations(self.request.query_params['q'].strip())
+
 class AnalysisTriggerView(APIView):
     """Trigger async analysis for a specific conversation."""
     def post(self, request, *args, **kwargs):
@@ -0,0 +1,114 @@
+# analysis/work_queue.py
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Subquery
+from django.utils import timezone
+from .models import AnalysisJob
+from .analyzer import analyze_conversations
+
+
+def queue_setting(name, default):
+    return getattr(settings, f'ANALYSIS_QUEUE_{name}', default)
+
+
+def enqueue(conversation_ids):
+    """
+    Add conversations to the pending-analysis queue (no-op for ones already queued).
+    """
+    AnalysisJob.objects.bulk_create(
+        [AnalysisJob(conversation_id=conversation_id) for conversation_id in conversation_ids],
+        ignore_conflicts=True,
+    )
+
+
+def claimable(now):
+    # Pending jobs past their backoff, plus running jobs whose worker let the lease expire
+    lease = timedelta(seconds=queue_setting('LEASE_SECONDS', 900))
+    return (
+        Q(status=AnalysisJob.PENDING, available_at__lte=now) |
+        Q(status=AnalysisJob.RUNNING, claimed_at__lt=now - lease)
+    )
+
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` jobs for this worker and return their conversation ids.
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED where supported so concurrent workers
+    never wait on or share rows. Otherwise (SQLite) the claim is a single
+    UPDATE ... WHERE id IN (SELECT ... LIMIT n): the statement takes the write lock
+    before it reads, so concurrent claimers queue on the busy timeout instead of
+    failing with "database is locked" when upgrading a read transaction.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claim = {
+        'status': AnalysisJob.RUNNING,
+        'claimed_by': token,
+        'claimed_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    candidates = AnalysisJob.objects.filter(claimable(now)).order_by('available_at')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            candidates = candidates.select_for_update(skip_locked=True)
+            job_ids = list(candidates.values_list('id', flat=True)[:limit])
+            AnalysisJob.objects.filter(id__in=job_ids).update(**claim)
+    else:
+        AnalysisJob.objects.filter(id__in=Subquery(candidates.values('id')[:limit])).update(**claim)
+
+    return list(AnalysisJob.objects.filter(claimed_by=token, status=AnalysisJob.RUNNING)
+                .values_list('conversation_id', flat=True))
+
+
+def finish_jobs(analysed=(), unanalyzable=(), failed=(), error=''):
+    """
+    Record outcomes: analysed jobs leave the queue, unanalyzable ones become terminal,
+    failed ones go back to pending with exponential backoff until attempts run out.
+    """
+    if analysed:
+        AnalysisJob.objects.filter(conversation_id__in=analysed).delete()
+
+    if unanalyzable:
+        AnalysisJob.objects.filter(conversation_id__in=unanalyzable).update(
+            status=AnalysisJob.UNANALYZABLE, claimed_by='', claimed_at=None
+        )
+
+    if failed:
+        now = timezone.now()
+        max_attempts = queue_setting('MAX_ATTEMPTS', 5)
+        backoff = queue_setting('BACKOFF_SECONDS', 60)
+        jobs = AnalysisJob.objects.filter(conversation_id__in=failed)
+
+        jobs.filter(attempts__gte=max_attempts).update(
+            status=AnalysisJob.FAILED, claimed_by='', claimed_at=None, last_error=error
+        )
+        retry = jobs.filter(attempts__lt=max_attempts)
+        for attempts in set(retry.values_list('attempts', flat=True)):
+            retry.filter(attempts=attempts).update(
+                status=AnalysisJob.PENDING,
+                claimed_by='',
+                claimed_at=None,
+                last_error=error,
+                available_at=now + timedelta(seconds=backoff * 2 ** max(attempts - 1, 0)),
+            )
+
+
+def process_claimed(conversation_ids):
+    """
+    Analyse claimed conversations as one batch and record each job's outcome.
+    Returns the ids that were analysed.
+    """
+    try:
+        analysed, skipped = analyze_conversations(conversation_ids)
+    except Exception as e:
+        print(f"Analysis batch failed for conversations {conversation_ids}: {e}")
+        finish_jobs(failed=conversation_ids, error=str(e))
+        return []
+
+    failed = set(conversation_ids) - set(analysed) - set(skipped)
+    finish_jobs(analysed, skipped, failed, error="Analysis raised an error")
+    return analysed
@@ -75,11 +75,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # ✅ REST Framework config
 REST_FRAMEWORK = {
+    # orjson-backed drop-ins for JSONRenderer / JSONParser (same bytes on the wire)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'analysis.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'analysis.renderers.ORJSONParser',
     ],
 }
 
@@ -92,6 +93,42 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 CELERY_IMPORTS = ('analysis.tasks',)
 
+# ✅ Auto-analysis on upload (opt-in)
+# New conversation ids are buffered per process and sent to a single
+# analyze_conversations_batch task every ANALYSIS_BATCH_SIZE ids or
+# ANALYSIS_BATCH_MAX_WAIT_MS milliseconds, whichever comes first.
+ANALYSIS_AUTO_ANALYZE = False
+ANALYSIS_BATCH_SIZE = 100
+ANALYSIS_BATCH_MAX_WAIT_MS = 500
+
+# ✅ Analyzer backend
+# OPTIONS are passed to the backend class as lowercase keyword arguments (URL -> url).
+# Heuristics only by default. To let a model service refine the scores:
+# ANALYSIS_BACKEND = {
+#     'BACKEND': 'analysis.backends.HTTPScoringBackend',
+#     'OPTIONS': {
+#         'URL': 'http://localhost:8765/score',
+#         'BATCH_SIZE': 32,        # conversations per request
+#         'MAX_CONCURRENCY': 4,    # requests in flight
+#         'TIMEOUT': 5.0,          # seconds per request, from when it starts; then heuristic scores
+#         'BATCH_TIMEOUT': None,   # optional deadline in seconds for all requests of a batch
+#         'HEADERS': {'Authorization': 'Bearer <token>'},  # sent with every request
+#         'MAX_RESPONSE_BYTES': 10485760,  # larger responses are abandoned
+#         'CACHE_TIMEOUT': 86400,  # seconds results stay in the Django cache
+#     },
+# }
+ANALYSIS_BACKEND = {
+    'BACKEND': 'analysis.backends.HeuristicBackend',
+}
+
+# ✅ Pending-analysis work queue (AnalysisJob)
+# Failed jobs are retried after ANALYSIS_QUEUE_BACKOFF_SECONDS * 2^(attempts - 1)
+# and marked failed after ANALYSIS_QUEUE_MAX_ATTEMPTS; a claimed job whose worker
+# died becomes claimable again after ANALYSIS_QUEUE_LEASE_SECONDS.
+ANALYSIS_QUEUE_MAX_ATTEMPTS = 5
+ANALYSIS_QUEUE_BACKOFF_SECONDS = 60
+ANALYSIS_QUEUE_LEASE_SECONDS = 900
+
 CELERY_BEAT_SCHEDULE = {
     'daily-conversation-analysis': {
         'task': 'analysis.tasks.run_daily_analysis',